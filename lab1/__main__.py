@@ -1,4 +1,19 @@
-from dfa import DFA
+import contextlib
+import io
+import itertools
+import os
+import random
+import tempfile
+import tracemalloc
+
+from .dfa import DFA
+from .engine import select_engine
+from .lazy_dfa import LazyDFA
+from .nfa import NFA
+from .symbol_classes import BYTE_ALPHABET, OUTSIDE_CLASS, UNICODE_ALPHABET
+from .syntax_tree import SyntaxTree, positions_set
+from . import parallel
+from . import transition_table
 
 TEST_REGEXPS = {
     'a': {
@@ -78,6 +93,7 @@ TEST_REGEXPS = {
 def setup_test(regexp):
     dfa = DFA(regexp)
     dfa.minimize()
+    dfa.compile()
     return dfa
 
 
@@ -86,6 +102,516 @@ def test(dfa, expected, terminals):
     assert expected is actual, 'expected = {}, actual = {}'.format(expected, actual)
 
 
+def test_compile():
+    print('TESTING COMPILED TABLE')
+    for test_regexp, test_cases in TEST_REGEXPS.items():
+        dfa = DFA(test_regexp)
+        assert dfa.fake_state not in dfa.states
+        assert dfa.fake_state not in dfa.transitions.values(), 'dead state must stay implicit'
+        for terminals, expected_result in test_cases.items():
+            test(dfa, expected_result, terminals)
+        dfa.minimize()
+        assert dfa.fake_state not in dfa.transitions.values()
+        table = dfa.compile()
+        assert table.finals[0] == 0, 'dead state must not be final'
+        assert len(table.table) == len(table) * table.width
+        for terminals, expected_result in test_cases.items():
+            test(dfa, expected_result, terminals)
+    print('\tPASSED')
+
+
+def test_simulate_many():
+    print('TESTING BATCH MATCHING')
+    numpy = transition_table.numpy
+    for test_regexp, test_cases in TEST_REGEXPS.items():
+        dfa = setup_test(test_regexp)
+        texts = list(test_cases.keys())
+        expected = list(test_cases.values())
+        assert list(dfa.simulate_many(texts)) == expected
+        assert list(dfa.match_batch(text for text in texts)) == expected
+        assert list(dfa.simulate_iter(iter(texts), batch_size=2)) == expected
+        if numpy is not None:
+            assert list(dfa.simulate_many(numpy.array(texts))) == expected
+            transition_table.numpy = None
+            try:
+                assert dfa.simulate_many(texts) == expected
+            finally:
+                transition_table.numpy = numpy
+    # inputs of very different lengths: grouped by length, rows dropped between column blocks
+    rng = random.Random(0)
+    dfa = setup_test('(a|b)*abb')
+    texts = [''.join(rng.choice('ab') for _ in range(rng.choice((0, 1, 3, 40, 70, 130, 300)))) for _ in range(2000)]
+    texts += ['ab'] * 20000 + ['ba' * 10000, 'b' * 20000 + 'abb']
+    expected = [dfa.simulate(text) for text in texts]
+    tracemalloc.start()
+    try:
+        assert list(dfa.simulate_many(texts)) == expected
+        # padding every input to the longest one would take gigabytes
+        assert tracemalloc.get_traced_memory()[1] < 64 * 1024 * 1024
+    finally:
+        tracemalloc.stop()
+    if numpy is not None:
+        assert list(dfa.simulate_many(numpy.array(texts[:2000]))) == expected[:2000]
+    # fixed-width numpy strings drop trailing NULs, the batch path must not
+    dfa = DFA('ab*\x00', BYTE_ALPHABET)
+    texts = [b'ab\x00', b'a\x00\x00', b'ab', b'\x00']
+    assert list(dfa.simulate_many(texts)) == [dfa.simulate(text) for text in texts] == [True, True, False, False]
+    texts = ['ab\x00', 'a', 'abbb\x00']
+    assert list(dfa.simulate_many(texts)) == [dfa.simulate(text) for text in texts] == [True, False, True]
+    print('\tPASSED')
+
+
+def test_minimize_algorithms():
+    print('TESTING MINIMIZATION ALGORITHMS')
+    regexps = list(TEST_REGEXPS.keys()) + ['(a|b)*a(a|b)(a|b)', '((ab)|(ab)*)e*f', '(a|b)*abb|(a|b)*aab']
+    for test_regexp in regexps:
+        hopcroft_dfa = DFA(test_regexp)
+        hopcroft_dfa.minimize()
+        table_dfa = DFA(test_regexp)
+        table_dfa.minimize(algorithm='table')
+        stats = hopcroft_dfa.minimization_stats
+        assert stats['states_after'] == len(hopcroft_dfa.states) <= stats['reachable_states'] <= stats['states_before']
+        assert len(hopcroft_dfa.states) == len(table_dfa.states), \
+            '{}: hopcroft = {}, table = {}'.format(test_regexp, len(hopcroft_dfa.states), len(table_dfa.states))
+        for terminals, expected_result in TEST_REGEXPS.get(test_regexp, {}).items():
+            test(table_dfa, expected_result, terminals)
+        for terminals in ['', 'a', 'ab', 'abb', 'aab', 'abaab', 'bbbabb', 'abef', 'ababf', 'f']:
+            test(hopcroft_dfa, table_dfa.simulate(terminals), terminals)
+    print('\tPASSED')
+
+
+def test_frozenset_states():
+    print('TESTING FROZENSET STATES')
+    for test_regexp, test_cases in TEST_REGEXPS.items():
+        bitmask_dfa = DFA(test_regexp)
+        frozenset_dfa = DFA(test_regexp, frozenset_states=True)
+        assert all(isinstance(state, int) for state in bitmask_dfa.states)
+        assert all(isinstance(state, frozenset) for state in frozenset_dfa.states)
+        assert len(bitmask_dfa.states) == len(frozenset_dfa.states)
+        assert len(bitmask_dfa.transitions) == len(frozenset_dfa.transitions)
+        frozenset_dfa.minimize()
+        for terminals, expected_result in test_cases.items():
+            test(frozenset_dfa, expected_result, terminals)
+    print('\tPASSED')
+
+
+def test_stats():
+    print('TESTING BUILD STATS')
+    events = []
+
+    def hook(event, stats):
+        events.append((event, stats))
+
+    DFA.add_stats_hook(hook)
+    try:
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            dfa = DFA('(a|b)*abb|[a-c]+x')
+            dfa.minimize()
+            dfa.compile()
+    finally:
+        DFA.remove_stats_hook(hook)
+    assert output.getvalue() == ''
+    assert [event for event, _ in events] == ['build', 'minimize']
+    assert all(stats is dfa.stats for _, stats in events)
+    assert dfa.stats['positions'] == 8
+    assert dfa.stats['minimization'] is dfa.minimization_stats
+    assert dfa.stats['minimization']['states_after'] == len(dfa.states)
+    assert dfa.stats['minimization']['transitions_after'] == len(dfa.transitions) <= dfa.stats['transitions']
+    assert set(dfa.stats['phase_times']) == {'tree', 'symbol_classes', 'subset_construction', 'dead_state', 'minimization', 'compile'}
+    assert all(elapsed >= 0 for elapsed in dfa.stats['phase_times'].values())
+    DFA('ab')
+    assert len(events) == 2
+    print('\tPASSED')
+
+
+def test_cache():
+    print('TESTING CACHE')
+    DFA.clear_cache()
+    DFA.set_cache_size(2)
+    try:
+        first = DFA.from_cache('ab*')
+        assert DFA.from_cache('ab*') is first
+        assert DFA.from_cache('ab*', set('ab')) is not first
+        DFA.from_cache('a|b')
+        assert DFA.cache_info() == {'hits': 1, 'misses': 3, 'evictions': 1, 'size': 2, 'max_size': 2}
+        assert DFA.from_cache('ab*') is not first
+        for terminals, expected_result in TEST_REGEXPS['ab*'].items():
+            test(first, expected_result, terminals)
+        try:
+            first.minimize()
+        except ValueError:
+            pass
+        else:
+            assert False, 'frozen DFA was minimized'
+    finally:
+        DFA.set_cache_size(128)
+        DFA.clear_cache()
+    print('\tPASSED')
+
+
+def expect_value_error(function, *args, **kwargs):
+    try:
+        function(*args, **kwargs)
+    except ValueError:
+        return
+    assert False, '{} did not raise ValueError'.format(function.__name__)
+
+
+def test_save_load():
+    print('TESTING SAVE/LOAD')
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'dfa.bin')
+        for test_regexp, test_cases in TEST_REGEXPS.items():
+            dfa = setup_test(test_regexp)
+            dfa.save(path)
+            for use_mmap in (True, False):
+                loaded = DFA.load(path, mmap=use_mmap, regexp=test_regexp, alphabet=dfa.alphabet)
+                assert loaded.frozen and loaded.regexp == test_regexp
+                assert len(loaded.states) == len(dfa.states)
+                assert len(loaded.transitions) == len(dfa.transitions)
+                for terminals, expected_result in test_cases.items():
+                    test(loaded, expected_result, terminals)
+                assert list(loaded.simulate_many(test_cases.keys())) == list(test_cases.values())
+                del loaded
+        expect_value_error(DFA.load, path, regexp='abc')
+        expect_value_error(DFA.load, path, alphabet=set('ab'))
+        with open(path, 'r+b') as dfa_file:
+            dfa_file.seek(transition_table.HEADER.size)
+            dfa_file.write(b'X')
+        expect_value_error(DFA.load, path)
+    print('\tPASSED')
+
+
+def test_lazy_dfa():
+    print('TESTING LAZY DFA')
+    for test_regexp, test_cases in TEST_REGEXPS.items():
+        dfa = LazyDFA(test_regexp)
+        for terminals, expected_result in test_cases.items():
+            test(dfa, expected_result, terminals)
+    # 2^21 states if built eagerly
+    dfa = LazyDFA('(a|b)*a' + '(a|b)' * 20 + 'c', set('abc'), cache_size=64)
+    rng = random.Random(0)
+    text = ''.join(rng.choice('ab') for _ in range(10000))
+    assert not dfa.simulate(text)
+    assert dfa.simulate(text + 'a' + 'b' * 20 + 'c')
+    assert len(dfa) <= 64 and dfa.cache_flushes > 0
+    print('\tPASSED')
+
+
+def test_syntax_tree():
+    print('TESTING SYNTAX TREE')
+    tree = SyntaxTree('(a|b)*abb')
+    assert [node.symbol for node in tree.position_nodes] == list('ababb#')
+    assert tree.marker_positions == [5]
+    assert positions_set(tree.root.firstpos) == {0, 1, 2}
+    assert [positions_set(node.followpos) for node in tree.position_nodes] == [
+        {0, 1, 2}, {0, 1, 2}, {3}, {4}, {5}, set()]
+    # escaped operators are plain symbols and take part in implicit concatenation
+    dfa = DFA('a\\|b\\*(\\(|\\))', set('ab|*()'))
+    for terminals, expected_result in {'a|b*(': True, 'a|b*)': True, 'ab': False, 'a|b*': False}.items():
+        test(dfa, expected_result, terminals)
+    assert DFA('a.b|c').simulate('ab') and DFA('a.b|c').simulate('c')
+    for invalid_regexp in ('', '(a', 'a)', '()', 'a||b', '*a', 'a|', '(|a)', 'a\\'):
+        expect_value_error(SyntaxTree, invalid_regexp)
+    # position sets cost the span of their members, not the highest position
+    tree = SyntaxTree('(ab|ba*)c' * 2000)
+    assert positions_set(tree.position_nodes[-3].followpos) == {len(tree.position_nodes) - 3, len(tree.position_nodes) - 2}
+    assert max(node.followpos[1].bit_length() for node in tree.position_nodes) <= 8
+    assert tree.root.left.firstpos is None and tree.root.firstpos == (0, 0b101)
+    print('\tPASSED')
+
+
+def test_extended_syntax():
+    print('TESTING EXTENDED SYNTAX')
+    # each extended regexp against its expansion into |, * and concatenation
+    equivalent_regexps = {
+        '[a-c]x': '(a|b|c)x',
+        '[^ab]c': '(c|x|-)c',
+        '[ab-]c': '(a|b|-)c',
+        'a+b': 'aa*b',
+        '(ab)+': 'ab(ab)*',
+        'ab?c': 'abc|ac',
+        '(a|b)?c': 'ac|bc|c',
+        'a{3}': 'aaa',
+        'a{2,}b': 'aaa*b',
+        'a{0,}b': 'a*b',
+        '(ab|c){1,3}x': '(ab|c)x|(ab|c)(ab|c)x|(ab|c)(ab|c)(ab|c)x',
+        '[a-c]{2}(x?)+': '(a|b|c)(a|b|c)x*',
+    }
+    rng = random.Random(0)
+    for extended_regexp, plain_regexp in equivalent_regexps.items():
+        alphabet = set('abcx-')
+        extended_dfa = DFA(extended_regexp, alphabet)
+        plain_dfa = DFA(plain_regexp, alphabet)
+        for _ in range(100):
+            text = ''.join(rng.choice('abcx-') for _ in range(rng.randint(0, 8)))
+            assert list(extended_dfa.finditer(text)) == list(plain_dfa.finditer(text)), \
+                '{!r} in {!r}'.format(extended_regexp, text)
+    # a class is one position however many symbols it holds
+    assert len(SyntaxTree('[a-zA-Z_][a-zA-Z_0-9]*').position_nodes) == 3
+    assert len(SyntaxTree('(a|b){3,5}').position_nodes) == 11
+    assert NFA('[^\\]]+', UNICODE_ALPHABET).simulate('\u0436')
+    assert DFA('(a#){2}', set('a#')).simulate('a#a#') and not DFA('(a#){2}', set('a#')).simulate('a#a')
+    # x{0} and x{0,0} match the empty string, {,n} is {0,n}
+    alphabet = set('abcx')
+    for regexp, matches in (('ab{0}c', {'ac'}), ('ab{0,0}c', {'ac'}), ('ab{,2}c', {'ac', 'abc', 'abbc'}),
+                            ('(ab{0}){2}c', {'aac'}), ('(a{0}|b){2}c', {'c', 'bc', 'bbc'})):
+        dfa = DFA(regexp, alphabet)
+        for text in ('ac', 'abc', 'abbc', 'abbbc', 'aac', 'c', 'bc', 'bbc', 'bbbc'):
+            assert dfa.simulate(text) == (text in matches), '{!r} on {!r}'.format(regexp, text)
+    for invalid_regexp in ('[ab', 'a]', '[z-a]', 'a{2', 'a{x}', 'a{3,2}', 'a{,}', 'a{,x}', '{2}', 'a**{'):
+        expect_value_error(SyntaxTree, invalid_regexp)
+    print('\tPASSED')
+
+
+def test_nfa():
+    print('TESTING NFA')
+    for test_regexp, test_cases in TEST_REGEXPS.items():
+        nfa = NFA(test_regexp)
+        assert nfa.bit_parallel
+        for terminals, expected_result in test_cases.items():
+            test(nfa, expected_result, terminals)
+    rng = random.Random(0)
+    for k in (5, 40):
+        regexp = '(a|b)*a' + '(a|b)' * k + 'c'
+        nfa = NFA(regexp, set('abc'))
+        lazy_dfa = LazyDFA(regexp, set('abc'))
+        assert nfa.bit_parallel == (k == 5)
+        texts = [''.join(rng.choice('abc') for _ in range(rng.randint(0, 60))) for _ in range(200)]
+        assert nfa.simulate_many(texts) == lazy_dfa.simulate_many(texts)
+        assert nfa.simulate('b' + 'a' + 'b' * k + 'c') and not nfa.simulate('a' + 'b' * (k + 1) + 'c')
+    for test_regexp in TEST_REGEXPS:
+        assert NFA(test_regexp).count_states() == len(DFA(test_regexp).states)
+    assert NFA('(a|b)*a' + '(a|b)' * 9, set('ab')).count_states() == 2 ** 10
+    assert NFA('(a|b)*a' + '(a|b)' * 20, set('ab')).count_states(limit=100) == 100
+
+    assert isinstance(select_engine('(a|b)*abb'), DFA)
+    assert isinstance(select_engine('(a|b)*a' + '(a|b)' * 12, set('ab')), LazyDFA)
+    assert isinstance(select_engine('(a|b)*a' + '(a|b)' * 20, set('ab'), lazy_dfa_states_limit=1000), NFA)
+    print('\tPASSED')
+
+
+def test_symbol_classes():
+    print('TESTING SYMBOL CLASSES')
+    dfa = setup_test('(a|b)*abb')
+    # outside the alphabet, 'a', 'b' and every other letter
+    assert len(dfa.symbol_classes) == 4 and dfa.table.width == 4
+    assert dfa.symbol_classes.class_of('c') == dfa.symbol_classes.class_of('Z') != OUTSIDE_CLASS
+    assert dfa.symbol_classes.class_of('1') == dfa.symbol_classes.class_of('\u0436') == OUTSIDE_CLASS
+
+    dfa = DFA('ab*c', BYTE_ALPHABET)
+    dfa.minimize()
+    assert dfa.simulate(b'abbbc\xff') and dfa.simulate('ac') and not dfa.simulate(b'a\x00c')
+    assert list(dfa.simulate_many([b'ac', b'bc\xff'])) == list(dfa.simulate_many(['ac', 'bc'])) == [True, False]
+
+    dfa = DFA('\u0436(\u0443|\u0451)*\u043a', UNICODE_ALPHABET)
+    dfa.minimize()
+    assert len(dfa.symbol_classes) == 6  # the outside class stays reserved even when it is empty
+    for terminals, expected_result in {'\u0436\u043a': True, '\u0436\u0443\u0451\u043a!': True, '\u0436x\u043a': False, '\U0001f600': False}.items():
+        test(dfa, expected_result, terminals)
+    assert list(dfa.simulate_many(['\u0436\u043a', '\U0001f600\u0436\u043a'])) == [True, False]
+    lazy_dfa = LazyDFA('\u0436(\u0443|\u0451)*\u043a', UNICODE_ALPHABET)
+    assert lazy_dfa.simulate('\u0436\u0451\u043a') and not lazy_dfa.simulate('\u0436\u0451')
+    print('\tPASSED')
+
+
+def test_multi_pattern():
+    print('TESTING MULTI-PATTERN DFA')
+    patterns = list(TEST_REGEXPS.keys())
+    single_dfas = [setup_test(pattern) for pattern in patterns]
+    for algorithm in ('hopcroft', 'table'):
+        dfa = DFA(patterns)
+        dfa.minimize(algorithm=algorithm)
+        for test_cases in TEST_REGEXPS.values():
+            for terminals in test_cases:
+                expected = set(
+                    pattern_id
+                    for pattern_id, single_dfa in enumerate(single_dfas)
+                    if single_dfa.simulate(terminals)
+                )
+                actual = dfa.match_patterns(terminals)
+                assert expected == actual, '{!r}: expected = {}, actual = {}'.format(terminals, expected, actual)
+                test(dfa, bool(expected), terminals)
+    # a '#' inside a pattern is a plain symbol, not another end marker
+    alphabet = set('abc#')
+    dfa = DFA(['a#b', 'c'], alphabet)
+    assert dfa.match_patterns('c') == {1} and dfa.match_patterns('a#b') == {0}
+    assert dfa.match_patterns('a') == set() and dfa.match_patterns('ab') == set()
+    for engine in (DFA('a#b', alphabet), LazyDFA('a#b', alphabet), NFA('a#b', alphabet)):
+        assert not engine.simulate('a') and engine.simulate('a#b') and not engine.simulate('ab')
+    print('\tPASSED')
+
+
+def brute_force_finditer(dfa, text):
+    def accepts(start, end):
+        state = dfa.table.initial_state
+        for symbol in text[start:end]:
+            state = dfa.table.next_state(state, symbol)
+        return dfa.table.finals[state] == 1
+
+    matches = []
+    pos = 0
+    while pos <= len(text):
+        for start in range(pos, len(text) + 1):
+            ends = [end for end in range(start, len(text) + 1) if accepts(start, end)]
+            if ends:
+                matches.append((start, max(ends)))
+                pos = max(ends) if max(ends) > start else start + 1
+                break
+        else:
+            break
+    return matches
+
+
+def test_search():
+    print('TESTING SEARCH')
+    rng = random.Random(0)
+    for test_regexp in list(TEST_REGEXPS.keys()) + ['(abcd)|c', 'ba*b', 'a|a*b', 'a|(ab)*c']:
+        dfa = setup_test(test_regexp)
+        for _ in range(30):
+            text = ''.join(rng.choice('abcd ') for _ in range(rng.randint(0, 12)))
+            expected = brute_force_finditer(dfa, text)
+            actual = list(dfa.finditer(text))
+            assert expected == actual, '{!r} in {!r}: expected = {}, actual = {}'.format(test_regexp, text, expected, actual)
+            assert dfa.search(text) == (expected[0] if expected else None)
+            assert list(dfa.finditer(text.encode())) == expected
+    dfa = setup_test('ab*')
+    assert dfa.search('xxabbbyaab a', 3) == (7, 8)
+    assert list(dfa.finditer('xxabbbyaab a', 8)) == [(8, 10), (11, 12)]
+    # every match scans on to the end of the text, where the scans merge
+    dfa = setup_test('a|a*b')
+    assert list(dfa.finditer('a' * 1000 + 'b')) == [(0, 1001)]
+    assert list(dfa.finditer('a' * 1000 + 'c')) == [(offset, offset + 1) for offset in range(1000)]
+    print('\tPASSED')
+
+
+def brute_force_match_ends(dfa, text):
+    return [end for end in range(len(text) + 1) if any(
+        dfa.table.finals[walk(dfa.table, text[start:end])] for start in range(end + 1)
+    )]
+
+
+def walk(table, text):
+    state = table.initial_state
+    for symbol in text:
+        state = table.next_state(state, symbol)
+    return state
+
+
+def test_product():
+    print('TESTING PRODUCT OPERATIONS')
+    texts = [''.join(symbols) for length in range(6) for symbols in itertools.product('abc', repeat=length)]
+
+    def language(dfa):
+        return set(text for text in texts if dfa.fullmatch(text))
+
+    # the dead state stays implicit: no edge leaves or enters it after minimization
+    def assert_implicit_dead(dfa):
+        assert all(
+            key.state in dfa.states and destination in dfa.states
+            for key, destination in dfa.transitions.items()
+        ), '{}: {}'.format(dfa.regexp, dfa.transitions)
+
+    regexps = ['(a|b)*abb', 'a*b*', '[ab]+c?', 'c|(ab)*', 'a{2,3}b?']
+    for regexp_a, regexp_b in itertools.product(regexps, repeat=2):
+        dfa_a = setup_test(regexp_a)
+        # another alphabet: 'c' is rejected by dfa_b only
+        dfa_b = DFA(regexp_b, set('ab'))
+        dfa_b.compile()
+        language_a = language(dfa_a)
+        language_b = language(dfa_b)
+        for result, expected in (
+            (dfa_a.intersection(dfa_b), language_a & language_b),
+            (dfa_a.union(dfa_b), language_a | language_b),
+            (dfa_a.difference(dfa_b), language_a - language_b),
+        ):
+            assert_implicit_dead(result)
+            result.compile()
+            assert language(result) == expected, '{}: {}'.format(result.regexp, language(result) ^ expected)
+            witness = result.shortest_witness()
+            assert result.is_empty() == (not expected)
+            assert witness is None if not expected else witness in expected and len(witness) == min(map(len, expected))
+        assert dfa_a.intersects(dfa_b) == bool(language_a & language_b)
+        assert dfa_a.is_subset(dfa_b) == (language_a <= language_b)
+        assert dfa_a.is_equivalent(dfa_b) == (language_a == language_b)
+        complement = dfa_a.complement()
+        assert_implicit_dead(complement)
+        complement.compile()
+        assert language(complement) == set(texts) - language_a
+    assert DFA('(a|b)*abb').is_equivalent(DFA('(b|a)*a(bb)'))
+    assert DFA('(a|b)*abb', set('ab')).difference(DFA('(a|b)*', set('ab'))).states == set()
+    assert DFA('ab').intersection(DFA('cd')).shortest_witness() is None
+    # a reachable state that merges into the dead block keeps no edges
+    dead_end = DFA('ab', set('abc')).intersection(DFA('ac', set('abc')))
+    assert_implicit_dead(dead_end)
+    assert dead_end.transitions == {} and dead_end.is_empty()
+    # products and queries use whole-string semantics, unlike simulate()
+    complement = DFA('a', set('ab')).complement()
+    assert complement.simulate('a') and not complement.fullmatch('a') and complement.fullmatch('ab')
+    assert not DFA('ab').is_subset(DFA('a')) and DFA('ab').fullmatch('ab') and not DFA('a').fullmatch('ab')
+    assert DFA('ab').simulate('abb') and not DFA('ab').fullmatch('abb')
+    # a union takes in both alphabets, a complement is over the alphabet a result records
+    union = DFA('a', set('a')).union(DFA('b', set('b')))
+    assert union.alphabet == ((ord('a'), ord('b')),) and union.fullmatch('b')
+    complement = union.complement()
+    assert complement.fullmatch('bb') and complement.fullmatch('') and not complement.fullmatch('b')
+    assert not complement.fullmatch('c') and not DFA('a', set('a')).complement().fullmatch('b')
+    complement = DFA('a', set('ab')).intersection(DFA('a', set('a'))).complement()
+    assert complement.fullmatch('b') and not complement.fullmatch('a')
+    print('\tPASSED')
+
+
+def test_stream():
+    print('TESTING STREAM MATCHER')
+    rng = random.Random(0)
+    for test_regexp in list(TEST_REGEXPS.keys()) + ['(abcd)|c', 'ba*b']:
+        dfa = setup_test(test_regexp)
+        for _ in range(20):
+            text = ''.join(rng.choice('abcd ') for _ in range(rng.randint(0, 20)))
+            expected = brute_force_match_ends(dfa, text)
+            matcher = dfa.matcher()
+            cuts = sorted(rng.randint(0, len(text)) for _ in range(3))
+            actual = []
+            for start, end in zip([0] + cuts, cuts + [len(text)]):
+                actual.extend(matcher.feed(text[start:end]))
+            assert expected == actual, '{!r} in {!r}: expected = {}, actual = {}'.format(test_regexp, text, expected, actual)
+            assert matcher.offset == len(text) and matcher.matches_count == len(expected)
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'text')
+                with open(path, 'wb') as file:
+                    file.write(text.encode())
+                assert list(dfa.scan_file(path, chunk_size=3)) == expected
+    matcher = setup_test('abb').matcher()
+    assert matcher.feed('xa') == [] and matcher.feed('b') == [] and matcher.feed('bab') == [4]
+    matcher.reset()
+    assert matcher.feed(b'abb') == [3]
+    print('\tPASSED')
+
+
+def test_parallel():
+    print('TESTING PARALLEL SCAN')
+    rng = random.Random(0)
+    for test_regexp in ['(a|b)*abb', 'ba*b', '(abcd)|c', 'a*']:
+        dfa = setup_test(test_regexp)
+        unanchored_table = dfa._get_unanchored_table()
+        text = ''.join(rng.choice('abcd ') for _ in range(300)).encode()
+        expected = list(dfa.matcher().feed(text))
+        state = unanchored_table.initial_state
+        matches_count = unanchored_table.finals[state]
+        for start in range(0, len(text), 37):
+            state, chunk_matches = parallel.transfer_function(
+                unanchored_table, text[start:start + 37], range(1, len(unanchored_table)))[state]
+            matches_count += chunk_matches
+        assert matches_count == len(expected), '{}: expected = {}, actual = {}'.format(test_regexp, len(expected), matches_count)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'text')
+            with open(path, 'wb') as file:
+                file.write(text)
+            assert dfa.count_file_matches(path, processes=2, chunks=7) == len(expected)
+    print('\tPASSED')
+
+
 def main():
     print('TESTING')
     for test_regexp, test_cases in TEST_REGEXPS.items():
@@ -95,6 +621,23 @@ def main():
             print('\tTERMINALS: \'{}\', EXPECTED: {}'.format(terminals, expected_result))
             test(dfa, expected_result, terminals)
             print('\tPASSED')
+    test_compile()
+    test_simulate_many()
+    test_minimize_algorithms()
+    test_frozenset_states()
+    test_stats()
+    test_cache()
+    test_save_load()
+    test_lazy_dfa()
+    test_syntax_tree()
+    test_extended_syntax()
+    test_nfa()
+    test_symbol_classes()
+    test_multi_pattern()
+    test_search()
+    test_product()
+    test_stream()
+    test_parallel()
     '''
     expected_responses = [
         [False, True, False, False, False, False, False, False],
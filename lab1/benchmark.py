@@ -0,0 +1,434 @@
+import itertools
+import os
+import random
+from string import ascii_lowercase, digits
+import tempfile
+import time
+import tracemalloc
+
+from .dfa import DEFAULT_ALPHABET, DFA, TransitionKey
+from .engine import select_engine
+from .lazy_dfa import LazyDFA
+from .nfa import NFA
+from . import syntax_tree
+from .syntax_tree import SyntaxTree
+
+
+def measure(function, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def random_strings(alphabet, count, length, seed=0):
+    rng = random.Random(seed)
+    symbols = sorted(alphabet)
+    return [''.join(rng.choice(symbols) for _ in range(length)) for _ in range(count)]
+
+
+# the old simulate(): walks self.transitions, hashing a TransitionKey per symbol
+def simulate_transitions(dfa, text):
+    class_of = dfa.symbol_classes.class_of
+    current_state = dfa.initial_state
+    for symbol in text:
+        if current_state in dfa.final_states:
+            return True
+        current_state = dfa.transitions.get(TransitionKey(current_state, class_of(symbol)))
+        if current_state is None:
+            return False
+    return current_state in dfa.final_states
+
+
+def benchmark_simulate(regexp='(a|b)*abb', count=100000, length=16):
+    dfa = DFA(regexp)
+    dfa.minimize()
+    dfa.compile()
+    texts = random_strings('ab', count, length)
+
+    def run_dict():
+        for text in texts:
+            simulate_transitions(dfa, text)
+
+    def run_table():
+        for text in texts:
+            dfa.simulate(text)
+
+    dict_time = measure(run_dict)
+    table_time = measure(run_table)
+    print('simulate {!r}: {} strings x {} symbols'.format(regexp, count, length))
+    print('\tdict walk:   {:.3f}s'.format(dict_time))
+    print('\tarray table: {:.3f}s ({:.2f}x)'.format(table_time, dict_time / table_time))
+
+
+def benchmark_simulate_many(regexp='(a|b)*abbabb', count=100000, length=16):
+    dfa = DFA(regexp)
+    dfa.minimize()
+    dfa.compile()
+    texts = random_strings('ab', count, length)
+
+    def run_loop():
+        for text in texts:
+            dfa.simulate(text)
+
+    loop_time = measure(run_loop)
+    batch_time = measure(dfa.simulate_many, texts)
+    print('simulate_many {!r}: {} strings x {} symbols'.format(regexp, count, length))
+    print('\tsimulate() loop: {:.3f}s'.format(loop_time))
+    print('\tsimulate_many:   {:.3f}s ({:.2f}x)'.format(batch_time, loop_time / batch_time))
+
+
+# (a|b)*a(a|b)...(a|b): the k-th symbol from the end is 'a', 2^(k+1) DFA states
+def generated_regexp(k):
+    return '(a|b)*a' + '(a|b)' * k
+
+
+def benchmark_construction(ks=(9, 12, 15)):
+    for k in ks:
+        regexp = generated_regexp(k)
+        start = time.perf_counter()
+        dfa = DFA(regexp, set('ab'))
+        elapsed = time.perf_counter() - start
+        print('construct k={} ({} states): {:.3f}s'.format(k, len(dfa.states), elapsed))
+
+
+def benchmark_build_phases(ks=range(4, 13)):
+    phase_totals = {}
+
+    # stats of a minimized DFA hold the build phases as well
+    def collect(event, stats):
+        if event != 'minimize':
+            return
+        for phase, elapsed in stats['phase_times'].items():
+            phase_totals[phase] = phase_totals.get(phase, 0) + elapsed
+
+    DFA.add_stats_hook(collect)
+    try:
+        for k in ks:
+            dfa = DFA(generated_regexp(k), set('ab'))
+            dfa.minimize()
+    finally:
+        DFA.remove_stats_hook(collect)
+    print('build phases over k={}..{}:'.format(min(ks), max(ks)))
+    for phase, elapsed in sorted(phase_totals.items(), key=lambda item: -item[1]):
+        print('\t{:20}: {:.3f}s'.format(phase, elapsed))
+
+
+def benchmark_compile(lengths=(10000, 100000, 200000)):
+    # no long run of nullable items, so followpos stays linear in the pattern
+    for length in lengths:
+        regexp = '(ab|ba*)c' * (length // 9)
+        start = time.perf_counter()
+        syntax_tree = SyntaxTree(regexp)
+        elapsed = time.perf_counter() - start
+        positions_count = len(syntax_tree.position_nodes)
+        del syntax_tree
+        _, peak = peak_allocated_by(SyntaxTree, regexp)
+        print('compile {} characters ({} positions): {:.3f}s, peak {:.1f} MiB'.format(
+            len(regexp), positions_count, elapsed, peak / 1024 / 1024))
+
+
+# SyntaxNode before __slots__, every instance carrying a __dict__
+class DictSyntaxNode:
+    def __init__(self, symbol, position=None, left=None, right=None, nullable=None, firstpos=None, lastpos=None):
+        self.symbol = symbol
+        self.position = position
+        self.left = left
+        self.right = right
+        self.nullable = nullable
+        self.firstpos = firstpos
+        self.lastpos = lastpos
+        self.followpos = syntax_tree.EMPTY_POSITIONS
+
+
+# __slots__ only removes the per-node __dict__; the doubling sizes show whether memory per
+# position stays flat, i.e. whether the tree (position sets included) is linear in the pattern
+def benchmark_syntax_nodes(regexps=(('(ab|ba*)c', (5000, 10000, 20000)), ('[a-z]x?', (20000, 40000)))):
+    for item, repeats in regexps:
+        for repeat in repeats:
+            regexp = item * repeat
+            print('syntax tree of {} characters:'.format(len(regexp)))
+            for name, node_class in (('__dict__', DictSyntaxNode), ('__slots__', syntax_tree.SyntaxNode)):
+                slotted_node_class = syntax_tree.SyntaxNode
+                syntax_tree.SyntaxNode = node_class
+                try:
+                    tree, memory = allocated_by(SyntaxTree, regexp)
+                    build_time = measure(SyntaxTree, regexp)
+                finally:
+                    syntax_tree.SyntaxNode = slotted_node_class
+                positions_count = len(tree.position_nodes)
+                print('\t{:9}: {} positions, {:.1f} MiB ({:.0f} bytes per position), {:.3f}s'.format(
+                    name, positions_count, memory / 1024 / 1024, memory / positions_count, build_time))
+
+
+def benchmark_character_classes():
+    lowercase = '(' + '|'.join(ascii_lowercase) + ')'
+    alphanumeric = '(' + '|'.join(ascii_lowercase + digits) + ')'
+    regexps = (
+        ('classes', '[a-z][a-z0-9]*@[a-z]+(\\.[a-z]{2,4})?'),
+        ('alternations', '{0}{1}*@{0}{0}*(\\.{0}{0}({0}({0})?)?)?'.format(lowercase, alphanumeric)),
+    )
+    alphabet = set(ascii_lowercase + digits + '@.')
+    for name, regexp in regexps:
+        start = time.perf_counter()
+        dfa = DFA(regexp, alphabet)
+        dfa.minimize()
+        elapsed = time.perf_counter() - start
+        print('{:12}: {} positions, build + minimize {:.4f}s ({} states)'.format(
+            name, len(SyntaxTree(regexp).position_nodes), elapsed, len(dfa.states)))
+
+
+def benchmark_minimize(ks=(9, 12, 15, 16), table_limit=2000):
+    for k in ks:
+        regexp = generated_regexp(k)
+        for algorithm in ('hopcroft', 'table'):
+            dfa = DFA(regexp, set('ab'))
+            states_before = len(dfa.states)
+            if algorithm == 'table' and states_before > table_limit:
+                continue
+            start = time.perf_counter()
+            dfa.minimize(algorithm=algorithm)
+            elapsed = time.perf_counter() - start
+            print('minimize k={} ({} -> {} states, {} reachable), {}: {:.3f}s'.format(
+                k, states_before, len(dfa.states), dfa.minimization_stats['reachable_states'], algorithm, elapsed))
+
+
+def benchmark_load(k=15):
+    regexp = generated_regexp(k)
+    start = time.perf_counter()
+    dfa = DFA(regexp, set('ab'))
+    dfa.minimize()
+    dfa.compile()
+    build_time = time.perf_counter() - start
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'dfa.bin')
+        dfa.save(path)
+        print('load k={} ({} states, {} bytes)'.format(k, len(dfa.states), os.path.getsize(path)))
+        print('\tbuild + minimize + compile: {:.3f}s'.format(build_time))
+        for use_mmap in (False, True):
+            start = time.perf_counter()
+            loaded = DFA.load(path, mmap=use_mmap)
+            print('\tload (mmap={}): {:.3f}s'.format(use_mmap, time.perf_counter() - start))
+            del loaded
+
+
+def allocated_by(function, *args):
+    tracemalloc.start()
+    try:
+        result = function(*args)
+        return result, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def peak_allocated_by(function, *args):
+    tracemalloc.start()
+    try:
+        result = function(*args)
+        return result, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+# what the constructor used to add: an explicit edge to the fake state for every missing (state, symbol class)
+def pad_transitions(dfa):
+    dfa.states.add(dfa.fake_state)
+    for state in dfa.states:
+        for symbol in dfa.symbol_classes.alphabet_classes():
+            dfa.transitions.setdefault(TransitionKey(state, symbol), dfa.fake_state)
+
+
+def benchmark_dead_state(k=9):
+    regexp = generated_regexp(k)
+    for name, alphabet in (('52 letters', DEFAULT_ALPHABET), ('256 bytes', frozenset(map(chr, range(256))))):
+        dfa, implicit_memory = allocated_by(DFA, regexp, alphabet)
+        implicit_transitions = len(dfa.transitions)
+        _, padding_memory = allocated_by(pad_transitions, dfa)
+        print('dead state k={} ({} states), {}:'.format(k, len(dfa.states) - 1, name))
+        print('\timplicit: {} transitions, {:.1f} KiB'.format(implicit_transitions, implicit_memory / 1024))
+        print('\tpadded:   {} transitions, {:.1f} KiB'.format(len(dfa.transitions), (implicit_memory + padding_memory) / 1024))
+
+
+def benchmark_multi_pattern(patterns_count=100, count=2000, length=32):
+    rng = random.Random(1)
+    patterns = ['{}({}|{})*{}'.format(*(''.join(rng.choice('abcdef') for _ in range(3)) for _ in range(4))) for _ in range(patterns_count)]
+    texts = random_strings('abcdef', count, length)
+    dfas = []
+    for pattern in patterns:
+        dfa = DFA(pattern, set('abcdef'))
+        dfa.minimize()
+        dfa.compile()
+        dfas.append(dfa)
+    multi_dfa = DFA(patterns, set('abcdef'))
+    multi_dfa.minimize()
+    multi_dfa.compile()
+
+    def run_single():
+        for text in texts:
+            for dfa in dfas:
+                dfa.simulate(text)
+
+    def run_multi():
+        for text in texts:
+            multi_dfa.match_patterns(text)
+
+    single_time = measure(run_single)
+    multi_time = measure(run_multi)
+    print('multi-pattern: {} patterns ({} states combined), {} strings x {} symbols'.format(
+        patterns_count, len(multi_dfa.states), count, length))
+    print('\tone DFA per pattern: {:.3f}s'.format(single_time))
+    print('\tcombined DFA:        {:.3f}s ({:.2f}x)'.format(multi_time, single_time / multi_time))
+
+
+def benchmark_search(regexp='ab*a', length=20000):
+    dfa = DFA(regexp)
+    dfa.minimize()
+    dfa.compile()
+    text = random_strings('abcdefgh ', 1, length)[0]
+
+    # what callers did before: simulate() from every offset, prefix answers only
+    def run_per_offset():
+        for offset in range(len(text)):
+            dfa.simulate(text[offset:])
+
+    per_offset_time = measure(run_per_offset, repeat=1)
+    finditer_time = measure(lambda: list(dfa.finditer(text)))
+    print('search {!r} in {} symbols ({} matches)'.format(regexp, length, len(list(dfa.finditer(text)))))
+    print('\tsimulate() per offset: {:.3f}s'.format(per_offset_time))
+    print('\tfinditer():            {:.3f}s ({:.2f}x)'.format(finditer_time, per_offset_time / finditer_time))
+
+
+# every match of 'a|a*b' in 'a' * n is one symbol long, but its forward scan can only stop at
+# the end of the text; once the scans merge, doubling n should double the time, not quadruple it
+def benchmark_search_worst_case(regexp='a|a*b', lengths=(2000, 4000, 8000, 64000)):
+    dfa = DFA(regexp)
+    dfa.minimize()
+    dfa.compile()
+    print('search {!r} in \'a\' * n:'.format(regexp))
+    for length in lengths:
+        text = 'a' * length
+        finditer_time = measure(lambda: list(dfa.finditer(text)))
+        print('\tn = {:6}: {:.3f}s'.format(length, finditer_time))
+
+
+def write_random_file(path, size, chunk_size=1 << 20, seed=2):
+    rng = random.Random(seed)
+    with open(path, 'wb') as file:
+        for _ in range(0, size, chunk_size):
+            file.write(bytes(rng.choices(b'abcdefgh \n', k=chunk_size)))
+
+
+def benchmark_stream(regexp='ab*a', size=8 << 20, chunk_size=1 << 20):
+    dfa = DFA(regexp)
+    dfa.minimize()
+    dfa.compile()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'text')
+        write_random_file(path, size, chunk_size)
+        matches_count = 0
+
+        def run_scan():
+            nonlocal matches_count
+            matches_count = sum(1 for _ in dfa.scan_file(path, chunk_size))
+
+        scan_time = measure(run_scan, repeat=1)
+    print('stream {!r} over {} MiB file ({} match ends)'.format(regexp, size >> 20, matches_count))
+    print('\tscan_file(): {:.3f}s, {:.1f} MB/s'.format(scan_time, size / scan_time / 1e6))
+
+
+def benchmark_parallel(regexp='ab*a', size=32 << 20, max_processes=None):
+    dfa = DFA(regexp)
+    dfa.minimize()
+    dfa.compile()
+    max_processes = max_processes or os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'text')
+        write_random_file(path, size)
+        print('parallel scan {!r} over {} MiB file'.format(regexp, size >> 20))
+        base_time = None
+        for processes in range(1, max_processes + 1):
+            matches_count = 0
+
+            def run_count():
+                nonlocal matches_count
+                matches_count = dfa.count_file_matches(path, processes)
+
+            elapsed = measure(run_count, repeat=1)
+            base_time = base_time or elapsed
+            print('\t{} processes: {:.3f}s, {:.1f} MB/s ({:.2f}x), {} match ends'.format(
+                processes, elapsed, size / elapsed / 1e6, base_time / elapsed, matches_count))
+
+
+def benchmark_engines(ks=(9, 12, 15, 20), dfa_limit=15, count=200, length=200):
+    # the trailing 'c' never occurs, so every text is read to the end
+    texts = random_strings('ab', count, length)
+    alphabet = set('abc')
+    for k in ks:
+        regexp = generated_regexp(k) + 'c'
+        engines = [('nfa', lambda: NFA(regexp, alphabet)), ('lazy dfa', lambda: LazyDFA(regexp, alphabet))]
+        if k <= dfa_limit:
+            engines.append(('dfa', lambda: DFA(regexp, alphabet)))
+        print('engines k={} ({} positions), selected: {}'.format(
+            k, NFA(regexp, alphabet).positions_count, type(select_engine(regexp, alphabet)).__name__))
+        for name, build in engines:
+            start = time.perf_counter()
+            engine = build()
+            build_time = time.perf_counter() - start
+            simulate_time = measure(engine.simulate_many, texts, repeat=1)
+            print('\t{:8}: build {:.3f}s, {} x {} symbols {:.3f}s'.format(name, build_time, count, length, simulate_time))
+
+
+def benchmark_overlap(max_length=10):
+    dfa_a = DFA('[ab]*a[ab]{3}c', set('abc'))
+    dfa_b = DFA('[ab]*b{4}c', set('abc'))
+    for dfa in (dfa_a, dfa_b):
+        dfa.minimize()
+        dfa.compile()
+
+    def accepts(dfa, text):
+        state = dfa.table.initial_state
+        for symbol in text:
+            state = dfa.table.next_state(state, symbol)
+        return dfa.table.finals[state] == 1
+
+    # what callers did before: every string up to max_length through both automata
+    def run_enumeration():
+        for length in range(max_length + 1):
+            for symbols in itertools.product('abc', repeat=length):
+                text = ''.join(symbols)
+                if accepts(dfa_a, text) and accepts(dfa_b, text):
+                    return text
+        return None
+
+    enumeration_time = measure(run_enumeration, repeat=1)
+    product_time = measure(dfa_a.intersects, dfa_b)
+    print('overlap of {!r} and {!r} (witness {!r})'.format(dfa_a.regexp, dfa_b.regexp, dfa_a.intersection(dfa_b).shortest_witness()))
+    print('\tenumeration up to {} symbols: {:.5f}s'.format(max_length, enumeration_time))
+    print('\tproduct emptiness:           {:.5f}s ({:.0f}x)'.format(product_time, enumeration_time / product_time))
+
+
+def main():
+    benchmark_simulate()
+    benchmark_simulate_many()
+    benchmark_construction()
+    benchmark_build_phases()
+    benchmark_compile()
+    benchmark_syntax_nodes()
+    benchmark_character_classes()
+    benchmark_minimize()
+    benchmark_load()
+    benchmark_dead_state()
+    benchmark_multi_pattern()
+    benchmark_search()
+    benchmark_search_worst_case()
+    benchmark_stream()
+    benchmark_parallel()
+    benchmark_engines()
+    benchmark_overlap()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,142 +1,326 @@
-from collections import namedtuple, deque
-from notation_converter import NotationConverter, Operator
-from preprocessing import add_concatenation
+from collections import OrderedDict, deque
+from .parallel import count_file_matches
+from .product import product_table, shortest_accepted_classes, universal_table
+from .search import build_reverse_table, build_unanchored_table, finditer
+from .stream import StreamMatcher, scan_file
 from string import ascii_lowercase, ascii_uppercase
-from syntax_tree import SyntaxTree
+from .symbol_classes import SymbolClasses, to_ranges
+from .syntax_tree import SyntaxTree, iterate_positions, positions_mask
+from threading import Lock
+import time
+from .transition_table import DEAD_STATE, TransitionKey, TransitionTable, TransitionsView, load_table, save_table, source_checksum
+from types import MappingProxyType
 
 
-TransitionKey = namedtuple('TransitionKey', ['state', 'symbol'])
+DEFAULT_ALPHABET = frozenset(ascii_lowercase + ascii_uppercase)
 
 
 class DFA:
-    # '|', '*', '.', '(', ')', '#', '\' should be escaped with '\'
-    def __init__(self, regexp, alphabet=set(list(ascii_lowercase) + list(ascii_uppercase))):
-        self.alphabet = alphabet
-        replenished_regexp = regexp
-        preprocessed_regexp = add_concatenation(replenished_regexp + '', '.', lambda x: x.isalpha() or x in ')*#', lambda x: x.isalpha() or x in '(#')
-
-        operators = [
-            Operator(operator, priority)
-            for operator, priority in (('*', 2), ('.', 1), ('|', 0))
-        ]
-        converter = NotationConverter(operators)
+    # process-wide LRU cache of frozen, minimized and compiled automata, see from_cache()
+    _cache = OrderedDict()
+    _cache_size = 128
+    _cache_lock = Lock()
+    _cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+    # callables hook(event, stats) run after every build ('build') and minimize() ('minimize'), see add_stats_hook()
+    _stats_hooks = []
 
-        postfix_regexp = converter.infix_to_postfix(preprocessed_regexp) + '#.'
-        print('Postfix regexp: ', postfix_regexp)
+    # regexp syntax is described in SyntaxTree: |, *, +, ?, {m,n}, (), [a-z] and [^...]
+    # alphabet is a set of characters or a tuple of inclusive code point ranges (e.g. BYTE_ALPHABET);
+    # transitions are keyed by symbol class ids, see SymbolClasses
+    # regexp may be a list of patterns: final states then carry the ids (list indices) of the patterns they accept
+    # frozenset_states keeps the old frozenset-of-positions states, which are easier to read while debugging
+    def __init__(self, regexp, alphabet=DEFAULT_ALPHABET, frozenset_states=False):
+        self.regexp = regexp
+        self.patterns = [regexp] if isinstance(regexp, str) else list(regexp)
+        self.alphabet = alphabet
+        self.frozen = False
         self.states = set()
         self.initial_state = None
         self.transitions = {}
         self.final_states = set()
+        self.accepting = {}
+        self.table = None
+        self.reverse_table = None
+        self.unanchored_table = None
+        self.minimization_stats = None
+        phase_times = {}
 
+        # states are int bitmasks of syntax tree positions, the empty set 0 is the fake state
         unmarked_states = set()
-        syntax_tree = SyntaxTree(postfix_regexp)
-        self.initial_state = frozenset(syntax_tree.root.firstpos)
+        phase_start = time.perf_counter()
+        syntax_tree = SyntaxTree(self.patterns)
+        phase_times['tree'] = time.perf_counter() - phase_start
+        phase_start = time.perf_counter()
+        marker_patterns = {
+            marker_position: pattern_id
+            for pattern_id, marker_position in enumerate(syntax_tree.marker_positions)
+        }
+        symbol_nodes = [
+            position_node
+            for position_node in syntax_tree.position_nodes
+            if position_node.position not in marker_patterns
+        ]
+        self.symbol_classes = SymbolClasses(alphabet, [position_node.symbol for position_node in symbol_nodes])
+        position_classes = [
+            () if position_node.position in marker_patterns else self.symbol_classes.classes_of_symbol[position_node.symbol]
+            for position_node in syntax_tree.position_nodes
+        ]
+        phase_times['symbol_classes'] = time.perf_counter() - phase_start
+        phase_start = time.perf_counter()
+        self.initial_state = positions_mask(syntax_tree.root.firstpos)
         unmarked_states.add(self.initial_state)
         while unmarked_states:
             unmarked_state = unmarked_states.pop()
             self.states.add(unmarked_state)
-            symbol_positions = {}
-            for position in unmarked_state:
-                symbol = syntax_tree.position_nodes[position].symbol
-                if symbol not in symbol_positions:
-                    symbol_positions[symbol] = set([position])
-                else:
-                    symbol_positions[symbol].add(position)
-            for symbol, positions in symbol_positions.items():
-                follow_positions = set()
-                for position in positions:
-                    follow_positions = follow_positions.union(syntax_tree.position_nodes[position].followpos)
-                new_state = frozenset(follow_positions)
+            class_follow_positions = {}
+            for position in iterate_positions(unmarked_state):
+                followpos = positions_mask(syntax_tree.position_nodes[position].followpos)
+                for class_id in position_classes[position]:
+                    class_follow_positions[class_id] = class_follow_positions.get(class_id, 0) | followpos
+            for class_id, new_state in class_follow_positions.items():
                 if new_state not in self.states:
                     unmarked_states.add(new_state)
-                self.transitions[TransitionKey(unmarked_state, symbol)] = new_state
-        hash_position = syntax_tree.position_nodes[-1].position
+                self.transitions[TransitionKey(unmarked_state, class_id)] = new_state
+        markers_mask = sum(1 << marker_position for marker_position in marker_patterns)
         for state in self.states:
-            if hash_position in state:
+            if state & markers_mask:
                 self.final_states.add(state)
+                self.accepting[state] = frozenset(marker_patterns[position] for position in iterate_positions(state & markers_mask))
+        phase_times['subset_construction'] = time.perf_counter() - phase_start
+        phase_start = time.perf_counter()
 
         # remove traces of '#'
-        try:
-            self.states.remove(frozenset())
-            keys_to_remove = [key for key, value in self.transitions.items() if value == frozenset()]
+        if 0 in self.states:
+            self.states.remove(0)
+            keys_to_remove = [key for key, value in self.transitions.items() if value == 0]
             for key in keys_to_remove:
                 self.transitions.pop(key)
-        except Exception:
-            pass
+        phase_times['dead_state'] = time.perf_counter() - phase_start
 
-        self.fake_state = frozenset()
-        self.states.add(self.fake_state)
-        for state in self.states:
-            for symbol in self.alphabet:
-                key = TransitionKey(state, symbol)
-                if key not in self.transitions:
-                    self.transitions[key] = self.fake_state
-        for symbol in self.alphabet:
-            self.transitions[TransitionKey(self.fake_state, symbol)] = self.fake_state
+        if frozenset_states:
+            phase_start = time.perf_counter()
+            self._convert_to_frozenset_states()
+            phase_times['frozenset_states'] = time.perf_counter() - phase_start
+
+        # the fake (dead) state is implicit: it is not in self.states and every
+        # (state, symbol) pair missing from self.transitions leads to it
+        self.fake_state = frozenset() if frozenset_states else 0
+
+        # phase_times are in seconds; minimize() and compile() add their own phases
+        self.stats = {
+            'positions': len(syntax_tree.position_nodes),
+            'symbol_classes': len(self.symbol_classes),
+            'states': len(self.states),
+            'transitions': len(self.transitions),
+            'phase_times': phase_times,
+            'minimization': None,
+        }
+        self._report_stats('build')
+
+    @classmethod
+    def add_stats_hook(cls, hook):
+        with cls._cache_lock:
+            cls._stats_hooks = cls._stats_hooks + [hook]
+
+    @classmethod
+    def remove_stats_hook(cls, hook):
+        with cls._cache_lock:
+            cls._stats_hooks = [stats_hook for stats_hook in cls._stats_hooks if stats_hook is not hook]
+
+    def _report_stats(self, event):
+        for hook in self._stats_hooks:
+            hook(event, self.stats)
+
+    @classmethod
+    def from_cache(cls, regexp, alphabet=DEFAULT_ALPHABET):
+        key = (regexp if isinstance(regexp, str) else tuple(regexp), to_ranges(alphabet))
+        with cls._cache_lock:
+            dfa = cls._cache.get(key)
+            if dfa is not None:
+                cls._cache.move_to_end(key)
+                cls._cache_stats['hits'] += 1
+                return dfa
+            cls._cache_stats['misses'] += 1
+
+        dfa = cls(regexp, alphabet)
+        dfa.minimize()
+        dfa.compile()
+        dfa.freeze()
+
+        with cls._cache_lock:
+            # another thread may have built the same automaton meanwhile
+            dfa = cls._cache.setdefault(key, dfa)
+            cls._cache.move_to_end(key)
+            cls._evict(cls._cache_size)
+        return dfa
+
+    @classmethod
+    def set_cache_size(cls, size):
+        if size < 0:
+            raise ValueError('Cache size must be non-negative')
+        with cls._cache_lock:
+            cls._cache_size = size
+            cls._evict(size)
+
+    @classmethod
+    def cache_info(cls):
+        with cls._cache_lock:
+            return dict(cls._cache_stats, size=len(cls._cache), max_size=cls._cache_size)
+
+    @classmethod
+    def clear_cache(cls):
+        with cls._cache_lock:
+            cls._cache.clear()
+            for counter in cls._cache_stats:
+                cls._cache_stats[counter] = 0
+
+    @classmethod
+    def _evict(cls, size):
+        while len(cls._cache) > size:
+            cls._cache.popitem(last=False)
+            cls._cache_stats['evictions'] += 1
+
+    # shared automata must not change under their users
+    def freeze(self):
+        if self.table is None:
+            self.compile()
+        self.states = frozenset(self.states)
+        self.final_states = frozenset(self.final_states)
+        self.accepting = MappingProxyType(self.accepting)
+        self.transitions = MappingProxyType(self.transitions)
+        self.frozen = True
+
+    def save(self, path):
+        if len(self.patterns) != 1:
+            raise ValueError('Only single-pattern DFAs can be saved')
+        if self.table is None:
+            self.compile()
+        save_table(path, self.table, self.regexp, self.alphabet)
+
+    # the loaded DFA is frozen, its states are the table rows and its transitions a view of the table;
+    # passing regexp/alphabet checks that the file was built from them
+    @classmethod
+    def load(cls, path, mmap=True, regexp=None, alphabet=None):
+        table, stored_regexp, stored_alphabet = load_table(path, use_mmap=mmap)
+        if regexp is not None or alphabet is not None:
+            expected_checksum = source_checksum(
+                stored_regexp if regexp is None else regexp,
+                stored_alphabet if alphabet is None else alphabet,
+            )
+            if expected_checksum != source_checksum(stored_regexp, stored_alphabet):
+                raise ValueError('{}: DFA was built from {!r} over another alphabet or pattern'.format(path, stored_regexp))
+
+        dfa = cls.__new__(cls)
+        dfa.regexp = stored_regexp
+        dfa.alphabet = stored_alphabet
+        dfa.symbol_classes = table.symbol_classes
+        dfa.states = frozenset(range(1, len(table)))
+        dfa.initial_state = table.initial_state
+        dfa.final_states = frozenset(state for state in dfa.states if table.finals[state])
+        dfa.patterns = [stored_regexp]
+        dfa.accepting = MappingProxyType({state: frozenset([0]) for state in dfa.final_states})
+        dfa.transitions = TransitionsView(table)
+        dfa.fake_state = 0
+        dfa.table = table
+        dfa.reverse_table = None
+        dfa.unanchored_table = None
+        dfa.minimization_stats = None
+        dfa.stats = None
+        dfa.frozen = True
+        return dfa
+
+    # a minimizable DFA with the table's rows as states; its language is the one of regexp
+    @classmethod
+    def _from_table(cls, table, regexp, alphabet):
+        dfa = cls.__new__(cls)
+        dfa.regexp = regexp
+        dfa.patterns = [regexp]
+        dfa.alphabet = alphabet
+        dfa.frozen = False
+        dfa.symbol_classes = table.symbol_classes
+        dfa.states = set(range(DEAD_STATE + 1, len(table)))
+        dfa.initial_state = table.initial_state
+        dfa.transitions = {
+            TransitionKey(state, class_id): table.table[state * table.width + class_id]
+            for state in dfa.states
+            for class_id in table.symbol_classes.alphabet_classes()
+            if table.table[state * table.width + class_id] != DEAD_STATE
+        }
+        dfa.final_states = set(state for state in dfa.states if table.finals[state])
+        dfa.accepting = {state: frozenset([0]) for state in dfa.final_states}
+        dfa.fake_state = DEAD_STATE
+        dfa.table = None
+        dfa.reverse_table = None
+        dfa.unanchored_table = None
+        dfa.minimization_stats = None
+        dfa.stats = {
+            'positions': None,
+            'symbol_classes': len(dfa.symbol_classes),
+            'states': len(dfa.states),
+            'transitions': len(dfa.transitions),
+            'phase_times': {},
+            'minimization': None,
+        }
+        return dfa
+
+    def _convert_to_frozenset_states(self):
+        as_frozenset = {
+            state: frozenset(iterate_positions(state))
+            for state in self.states
+        }
+        as_frozenset[0] = frozenset()
+        self.states = set(as_frozenset[state] for state in self.states)
+        self.initial_state = as_frozenset[self.initial_state]
+        self.final_states = set(as_frozenset[state] for state in self.final_states)
+        self.accepting = {as_frozenset[state]: patterns for state, patterns in self.accepting.items()}
+        self.transitions = {
+            TransitionKey(as_frozenset[transition_key.state], transition_key.symbol): as_frozenset[destination]
+            for transition_key, destination in self.transitions.items()
+        }
 
     def _get_reachable_states(self, states_map):
-        reachable_states = [False] * (len(self.states) + 1)
-        marked_states = set()
-        stack = deque()
-        stack.append(self.initial_state)
+        adjacency = [[] for _ in range(len(states_map))]
+        for transition_key, destination in self.transitions.items():
+            adjacency[states_map[transition_key.state]].append(states_map[destination])
+
+        reachable_states = [False] * len(states_map)
+        initial_state_idx = states_map[self.initial_state]
+        reachable_states[initial_state_idx] = True
+        stack = [initial_state_idx]
         while stack:
             current_state = stack.pop()
-            marked_states.add(current_state)
-            unmarked_states = set([
-                self.transitions[transition_key]
-                for transition_key in self.transitions
-                if self.transitions[transition_key] not in marked_states
-            ])
-            stack.extend(unmarked_states)
-
-        for state in marked_states:
-            state_idx = states_map[state]
-            reachable_states[state_idx] = True
+            for destination in adjacency[current_state]:
+                if not reachable_states[destination]:
+                    reachable_states[destination] = True
+                    stack.append(destination)
         return reachable_states
 
-    def _get_inequality_matrix(self, states_number, final_states, reverse_edges):
+    # accept_labels[i] is None for non-final states and the set of accepted pattern ids otherwise
+    def _get_inequality_matrix(self, states_number, accept_labels, reverse_edges):
         inequality_matrix = []
         for i in range(states_number):
             inequality_matrix.append([False] * states_number)
         queue = deque()
         for i in range(states_number):
             for j in range(states_number):
-                if not inequality_matrix[i][j] and (i in final_states) is not (j in final_states):
+                if not inequality_matrix[i][j] and accept_labels[i] != accept_labels[j]:
                     inequality_matrix[i][j] = inequality_matrix[j][i] = True
                     queue.appendleft([i, j])
 
         while queue:
             i, j = queue.pop()
-            for symbol in self.alphabet:
-                for r in reverse_edges[i][symbol]:
-                    for s in reverse_edges[j][symbol]:
+            for symbol in self.symbol_classes.alphabet_classes():
+                for r in reverse_edges[i].get(symbol, ()):
+                    for s in reverse_edges[j].get(symbol, ()):
                         if not inequality_matrix[r][s]:
                             inequality_matrix[r][s] = inequality_matrix[s][r] = True
                             queue.append([r, s])
 
         return inequality_matrix
 
-    def minimize(self):
-        print('Before minimization: {} states'.format(len(self.states)))
-        states_map = {
-            state: idx + 1
-            for idx, state in enumerate(self.states.difference(set([self.fake_state])))
-        }
-        states_map[self.fake_state] = 0
-        reachable_states = self._get_reachable_states(states_map)
-        states_number = len(states_map)
-        reverse_edges = []
-        for i in range(states_number):
-            reverse_edges.append({
-                symbol: set()
-                for symbol in self.alphabet
-            })
-        final_states = [states_map[state] for state in self.final_states]
-        for transition_key, destination in self.transitions.items():
-            destination_idx = states_map[destination]
-            reverse_edges[destination_idx][transition_key.symbol].add(states_map[transition_key.state])
-
-        inequality_matrix = self._get_inequality_matrix(states_number, final_states, reverse_edges)
+    # reference table-filling algorithm, O(n^2) memory
+    def _get_table_components(self, states_number, accept_labels, reverse_edges, reachable_states):
+        inequality_matrix = self._get_inequality_matrix(states_number, accept_labels, reverse_edges)
 
         component = [-1] * states_number
         for i in range(states_number):
@@ -151,6 +335,88 @@ class DFA:
                 for j in range(i + 1, states_number):
                     if not inequality_matrix[i][j]:
                         component[j] = components_count
+        return component, components_count
+
+    # Hopcroft partition refinement, O(n * |symbol classes| * log n)
+    def _get_hopcroft_components(self, states_number, accept_labels, reverse_edges, reachable_states):
+        label_blocks = {}
+        for state, accept_label in enumerate(accept_labels):
+            label_blocks.setdefault(accept_label, set()).add(state)
+        blocks = list(label_blocks.values())
+        block_of = [0] * states_number
+        for block_idx, block in enumerate(blocks):
+            for state in block:
+                block_of[state] = block_idx
+
+        # every initial block but the largest one is a splitter
+        waiting = deque()
+        largest_block = max(range(len(blocks)), key=lambda block_idx: len(blocks[block_idx]))
+        for block_idx in range(len(blocks)):
+            if block_idx != largest_block:
+                for symbol in self.symbol_classes.alphabet_classes():
+                    waiting.append((block_idx, symbol))
+
+        while waiting:
+            splitter_idx, symbol = waiting.pop()
+            touched = {}
+            for state in blocks[splitter_idx]:
+                for predecessor in reverse_edges[state].get(symbol, ()):
+                    touched.setdefault(block_of[predecessor], set()).add(predecessor)
+            for block_idx, inside in touched.items():
+                block = blocks[block_idx]
+                if len(inside) == len(block):
+                    continue
+                # in place, so a split costs O(|inside|) instead of O(|block|)
+                block.difference_update(inside)
+                smaller, larger = (inside, block) if len(inside) <= len(block) else (block, inside)
+                blocks[block_idx] = larger
+                new_block_idx = len(blocks)
+                blocks.append(smaller)
+                for state in smaller:
+                    block_of[state] = new_block_idx
+                # whether or not (block_idx, symbol) is still waiting, adding the smaller half suffices
+                for waiting_symbol in self.symbol_classes.alphabet_classes():
+                    waiting.append((new_block_idx, waiting_symbol))
+
+        block_component = {block_of[0]: 0}
+        for i in range(1, states_number):
+            if reachable_states[i] and block_of[i] not in block_component:
+                block_component[block_of[i]] = len(block_component)
+        component = [block_component.get(block_of[i], -1) for i in range(states_number)]
+        return component, len(block_component) - 1
+
+    def minimize(self, algorithm='hopcroft'):
+        if self.frozen:
+            raise ValueError('Frozen DFA can not be minimized')
+        phase_start = time.perf_counter()
+        states_map = {
+            state: idx + 1
+            for idx, state in enumerate(self.states.difference(set([self.fake_state])))
+        }
+        states_map[self.fake_state] = 0
+        reachable_states = self._get_reachable_states(states_map)
+        states_number = len(states_map)
+        accept_labels = [None] * states_number
+        for state, patterns in self.accepting.items():
+            accept_labels[states_map[state]] = patterns
+        reverse_edges = [{} for _ in range(states_number)]
+        outgoing_symbols = [set() for _ in range(states_number)]
+        for transition_key, destination in self.transitions.items():
+            state_idx = states_map[transition_key.state]
+            reverse_edges[states_map[destination]].setdefault(transition_key.symbol, []).append(state_idx)
+            outgoing_symbols[state_idx].add(transition_key.symbol)
+        # edges into the implicit fake state only live while minimizing
+        for state_idx, symbols in enumerate(outgoing_symbols):
+            for symbol in self.symbol_classes.alphabet_classes():
+                if symbol not in symbols:
+                    reverse_edges[0].setdefault(symbol, []).append(state_idx)
+
+        if algorithm == 'hopcroft':
+            component, components_count = self._get_hopcroft_components(states_number, accept_labels, reverse_edges, reachable_states)
+        elif algorithm == 'table':
+            component, components_count = self._get_table_components(states_number, accept_labels, reverse_edges, reachable_states)
+        else:
+            raise ValueError('Unknown minimization algorithm: {}'.format(algorithm))
 
         self.states = set([
             i for i in range(1, components_count + 1)
@@ -159,32 +425,187 @@ class DFA:
         new_final_states = set([
             component[states_map[state]]
             for state in self.final_states
+            if component[states_map[state]] > 0
         ])
         self.final_states = new_final_states
+        self.accepting = {
+            component[states_map[state]]: patterns
+            for state, patterns in self.accepting.items()
+            if component[states_map[state]] > 0
+        }
+        # edges from or into the dead block (the fake state and whatever merged into it) stay implicit
         new_transitions = {
             TransitionKey(component[states_map[transition_key.state]], transition_key.symbol): component[states_map[destination]]
             for transition_key, destination in self.transitions.items()
-            if transition_key.state != self.fake_state and destination != self.fake_state
+            if component[states_map[transition_key.state]] > 0 and component[states_map[destination]] > 0
         }
         self.transitions = new_transitions
-        print('After minimization: {} states'.format(len(self.states)))
+        self.table = None
+        self.reverse_table = None
+        self.unanchored_table = None
+        self.minimization_stats = {
+            'algorithm': algorithm,
+            'states_before': states_number - 1,
+            'reachable_states': sum(reachable_states[1:]),
+            'states_after': len(self.states),
+            'transitions_after': len(self.transitions),
+        }
+        self.stats['phase_times']['minimization'] = time.perf_counter() - phase_start
+        self.stats['minimization'] = self.minimization_stats
+        self._report_stats('minimize')
 
+    def compile(self):
+        if self.frozen:
+            return self.table
+        self.reverse_table = None
+        self.unanchored_table = None
+        phase_start = time.perf_counter()
+        self.table = TransitionTable(
+            self.symbol_classes,
+            self.states,
+            self.initial_state,
+            self.accepting,
+            self.transitions,
+            dead_state=self.fake_state,
+        )
+        self.stats['phase_times']['compile'] = time.perf_counter() - phase_start
+        return self.table
+
+    # whether some prefix of text (the empty one included) is in the language
     def simulate(self, text):
-        current_state = self.initial_state
-        for symbol in text:
-            if current_state in self.final_states:
-                return True
-            current_state = self.transitions.get(TransitionKey(current_state, symbol))
-            if current_state is None:
-                return False
-        return current_state in self.final_states
+        if self.table is None:
+            self.compile()
+        return self.table.simulate(text)
+
+    # whether the whole of text is in the language
+    def fullmatch(self, text):
+        if self.table is None:
+            self.compile()
+        return self.table.fullmatch(text)
+
+    # ids of the patterns accepting some prefix of text
+    def match_patterns(self, text):
+        if self.table is None:
+            self.compile()
+        return self.table.match_patterns(text)
+
+    # (start, end) of the leftmost-longest match at or after pos, None if there is none
+    def search(self, text, pos=0):
+        return next(self.finditer(text, pos), None)
+
+    # non-overlapping leftmost-longest matches as (start, end) offsets, found with one backward
+    # pass of the reverse '.*'-prefixed automaton plus one forward pass per match; a forward pass
+    # stops where it meets an earlier one in the same state, but at worst each still reads the
+    # rest of the text, O(len(text) * matches) (see search.finditer)
+    def finditer(self, text, pos=0):
+        if self.table is None:
+            self.compile()
+        if self.reverse_table is None:
+            self.reverse_table = build_reverse_table(self.table)
+        return finditer(self.table, self.reverse_table, text, pos)
+
+    # resumable matcher reporting match end offsets across feed(chunk) calls
+    def matcher(self):
+        return StreamMatcher(self._get_unanchored_table())
+
+    # match end offsets in a file scanned through mmap, chunk_size bytes at a time
+    def scan_file(self, path, chunk_size=1 << 20):
+        return scan_file(self._get_unanchored_table(), path, chunk_size)
+
+    # number of match ends in a file, chunks scanned in parallel by a process pool
+    def count_file_matches(self, path, processes=None, chunks=None):
+        return count_file_matches(self._get_unanchored_table(), path, processes, chunks)
+
+    def _get_unanchored_table(self):
+        if self.table is None:
+            self.compile()
+        if self.unanchored_table is None:
+            self.unanchored_table = build_unanchored_table(self.table)
+        return self.unanchored_table
+
+    # product automata, minimized; they are built from the languages of whole strings, so match
+    # with fullmatch(): simulate() accepts once any prefix is in the language, and e.g. the
+    # complement of 'a' holds the empty string, a prefix of everything
+    # (the alphabets may differ, a symbol outside one of them is rejected by that side)
+    # the alphabet of the result is self.alphabet, except for union(): both alphabets merged
+    def intersection(self, other):
+        return self._product(other, 'intersection', '({})&({})')
+
+    def union(self, other):
+        alphabet = to_ranges(to_ranges(self.alphabet) + to_ranges(other.alphabet))
+        return self._product(other, 'union', '({})|({})', alphabet)
+
+    def difference(self, other):
+        return self._product(other, 'difference', '({})-({})')
+
+    # strings over self.alphabet not in the language: the universal language over it minus self
+    def complement(self):
+        return self._product(None, 'complement', '~({})')
+
+    def _product(self, other, operation, label, alphabet=None):
+        phase_start = time.perf_counter()
+        if operation == 'complement':
+            if self.table is None:
+                self.compile()
+            table = product_table(universal_table(self.alphabet), self.table, 'difference')
+            regexp = label.format(self.regexp)
+        else:
+            table = self._product_table(other, operation)
+            regexp = label.format(self.regexp, other.regexp)
+        dfa = DFA._from_table(table, regexp, self.alphabet if alphabet is None else alphabet)
+        dfa.stats['phase_times']['product'] = time.perf_counter() - phase_start
+        dfa.minimize()
+        return dfa
+
+    # the queries below are about languages of whole strings (fullmatch()), not about the texts
+    # simulate() accepts: 'ab' is not a subset of 'a', though simulate() of 'a' accepts every
+    # text that of 'ab' does
+
+    # shortest string in the language (one representative per symbol class), None if it is empty
+    def shortest_witness(self):
+        if self.table is None:
+            self.compile()
+        classes = shortest_accepted_classes(self.table)
+        if classes is None:
+            return None
+        return ''.join(self.symbol_classes.representative(class_id) for class_id in classes)
+
+    def is_empty(self):
+        return self.shortest_witness() is None
+
+    def intersects(self, other):
+        return shortest_accepted_classes(self._product_table(other, 'intersection')) is not None
+
+    def is_subset(self, other):
+        return shortest_accepted_classes(self._product_table(other, 'difference')) is None
+
+    def is_equivalent(self, other):
+        return shortest_accepted_classes(self._product_table(other, 'symmetric_difference')) is None
+
+    def _product_table(self, other, operation):
+        for dfa in (self, other):
+            if dfa.table is None:
+                dfa.compile()
+        return product_table(self.table, other.table, operation)
+
+    def simulate_many(self, texts):
+        if self.table is None:
+            self.compile()
+        return self.table.simulate_many(texts)
+
+    match_batch = simulate_many
+
+    def simulate_iter(self, texts, batch_size=4096):
+        if self.table is None:
+            self.compile()
+        return self.table.simulate_iter(texts, batch_size)
 
     def __str__(self):
         return 'Alphabet:\n{}\nStates:\n{}\nInitial state:\n{}\nTransitions:\n{}\nFinal states:\n{}\n'.format(
             self.alphabet,
             self.states,
             self.initial_state,
-            "\n".join(['{} + {} -> {}'.format(key.state, key.symbol, value) for key, value in self.transitions.items()]),
+            "\n".join(['{} + {} -> {}'.format(key.state, self.symbol_classes.describe(key.symbol), value) for key, value in self.transitions.items()]),
             self.final_states
         )
 
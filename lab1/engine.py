@@ -0,0 +1,24 @@
+from .dfa import DEFAULT_ALPHABET, DFA
+from .lazy_dfa import LazyDFA
+from .nfa import NFA
+
+
+DFA_STATES_LIMIT = 2000
+LAZY_DFA_STATES_LIMIT = 50000
+
+
+# picks the engine by how many states subset construction would build (explored only up to
+# the larger limit): a minimized full DFA when it is small, a lazy DFA whose cache can hold
+# most of it when it is not, and the NFA when even the lazy cache would keep being flushed
+def select_engine(regexp, alphabet=DEFAULT_ALPHABET, dfa_states_limit=DFA_STATES_LIMIT,
+                  lazy_dfa_states_limit=LAZY_DFA_STATES_LIMIT):
+    nfa = NFA(regexp, alphabet)
+    states_estimate = nfa.count_states(max(dfa_states_limit, lazy_dfa_states_limit) + 1)
+    if states_estimate <= dfa_states_limit:
+        dfa = DFA(regexp, alphabet)
+        dfa.minimize()
+        dfa.compile()
+        return dfa
+    if states_estimate <= lazy_dfa_states_limit:
+        return LazyDFA(regexp, alphabet, cache_size=states_estimate)
+    return nfa
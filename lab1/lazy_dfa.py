@@ -0,0 +1,64 @@
+from .dfa import DEFAULT_ALPHABET
+from .symbol_classes import SymbolClasses
+from .syntax_tree import SyntaxTree, iterate_positions, positions_mask
+
+
+class LazyDFA:
+    # builds DFA states (position bitmasks) from followpos only when simulate() reaches them;
+    # the state cache is flushed once it holds cache_size states, so memory stays bounded
+    # even for patterns whose full DFA is exponential
+    def __init__(self, regexp, alphabet=DEFAULT_ALPHABET, cache_size=10000):
+        self.regexp = regexp
+        self.alphabet = alphabet
+        self.cache_size = cache_size
+        self.cache = {}
+        self.cache_flushes = 0
+
+        syntax_tree = SyntaxTree(regexp)
+        hash_position = syntax_tree.marker_positions[-1]
+        self.initial_state = positions_mask(syntax_tree.root.firstpos)
+        self.final_mask = 1 << hash_position
+        # (base, mask) pairs as in the syntax tree, shifted into place only when a state is built
+        self.followpos = [position_node.followpos for position_node in syntax_tree.position_nodes]
+        symbol_nodes = syntax_tree.position_nodes[:hash_position]
+        self.symbol_classes = SymbolClasses(alphabet, [position_node.symbol for position_node in symbol_nodes])
+        self.class_positions = {}
+        for position_node in symbol_nodes:
+            for class_id in self.symbol_classes.classes_of_symbol[position_node.symbol]:
+                self.class_positions[class_id] = self.class_positions.get(class_id, 0) | 1 << position_node.position
+
+    def next_state(self, state, class_id):
+        transitions = self.cache.get(state)
+        if transitions is None:
+            if len(self.cache) >= self.cache_size:
+                self.cache.clear()
+                self.cache_flushes += 1
+            transitions = self.cache[state] = {}
+        new_state = transitions.get(class_id)
+        if new_state is None:
+            new_state = 0
+            for position in iterate_positions(state & self.class_positions.get(class_id, 0)):
+                base, mask = self.followpos[position]
+                new_state |= mask << base
+            transitions[class_id] = new_state
+        return new_state
+
+    def simulate(self, text):
+        final_mask = self.final_mask
+        next_state = self.next_state
+        byte_classes = self.symbol_classes.byte_classes
+        class_of = self.symbol_classes.class_of
+        current_state = self.initial_state
+        for code in map(ord, text) if isinstance(text, str) else text:
+            if current_state & final_mask:
+                return True
+            current_state = next_state(current_state, byte_classes[code] if code < 256 else class_of(code))
+            if not current_state:
+                return False
+        return current_state & final_mask != 0
+
+    def simulate_many(self, texts):
+        return [self.simulate(text) for text in texts]
+
+    def __len__(self):
+        return len(self.cache)
@@ -0,0 +1,93 @@
+from .dfa import DEFAULT_ALPHABET
+from .symbol_classes import SymbolClasses
+from .syntax_tree import SyntaxTree, iterate_positions, positions_mask
+
+
+# up to this many positions the follow step goes through byte-indexed tables instead of single bits
+BIT_PARALLEL_POSITIONS = 64
+
+
+class NFA:
+    # simulates the position (Glushkov) automaton from followpos without determinizing it:
+    # a state is the int bitmask of the positions that may be read next, so construction
+    # is linear in the regexp however many states the equivalent DFA would have
+    def __init__(self, regexp, alphabet=DEFAULT_ALPHABET):
+        self.regexp = regexp
+        self.alphabet = alphabet
+
+        syntax_tree = SyntaxTree(regexp)
+        hash_position = syntax_tree.marker_positions[-1]
+        self.positions_count = len(syntax_tree.position_nodes)
+        self.initial_state = positions_mask(syntax_tree.root.firstpos)
+        self.final_mask = 1 << hash_position
+        # (base, mask) pairs as in the syntax tree, shifted into place only when a state is built
+        self.followpos = [position_node.followpos for position_node in syntax_tree.position_nodes]
+        symbol_nodes = syntax_tree.position_nodes[:hash_position]
+        self.symbol_classes = SymbolClasses(alphabet, [position_node.symbol for position_node in symbol_nodes])
+        self.class_masks = [0] * len(self.symbol_classes)
+        for position_node in symbol_nodes:
+            for class_id in self.symbol_classes.classes_of_symbol[position_node.symbol]:
+                self.class_masks[class_id] |= 1 << position_node.position
+
+        self.bit_parallel = self.positions_count <= BIT_PARALLEL_POSITIONS
+        self.follow_tables = self._build_follow_tables() if self.bit_parallel else None
+
+    # follow_tables[k][byte] is the union of followpos over the positions 8k + i with bit i set in byte
+    def _build_follow_tables(self):
+        follow_tables = []
+        for first_position in range(0, self.positions_count, 8):
+            follow_table = [0] * 256
+            for byte in range(1, 256):
+                lowest = byte & -byte
+                position = first_position + lowest.bit_length() - 1
+                follow_table[byte] = follow_table[byte ^ lowest] | (
+                    positions_mask(self.followpos[position]) if position < self.positions_count else 0)
+            follow_tables.append(follow_table)
+        return follow_tables
+
+    def next_state(self, state, class_id):
+        active = state & self.class_masks[class_id]
+        new_state = 0
+        if self.bit_parallel:
+            for follow_table in self.follow_tables:
+                if not active:
+                    break
+                new_state |= follow_table[active & 0xFF]
+                active >>= 8
+        else:
+            for position in iterate_positions(active):
+                base, mask = self.followpos[position]
+                new_state |= mask << base
+        return new_state
+
+    def simulate(self, text):
+        final_mask = self.final_mask
+        next_state = self.next_state
+        byte_classes = self.symbol_classes.byte_classes
+        class_of = self.symbol_classes.class_of
+        current_state = self.initial_state
+        for code in map(ord, text) if isinstance(text, str) else text:
+            if current_state & final_mask:
+                return True
+            current_state = next_state(current_state, byte_classes[code] if code < 256 else class_of(code))
+            if not current_state:
+                return False
+        return current_state & final_mask != 0
+
+    def simulate_many(self, texts):
+        return [self.simulate(text) for text in texts]
+
+    # number of DFA states subset construction would reach (the dead state excluded), counting stops at limit
+    def count_states(self, limit=None):
+        seen = {self.initial_state}
+        unmarked_states = [self.initial_state]
+        while unmarked_states:
+            state = unmarked_states.pop()
+            for class_id in self.symbol_classes.alphabet_classes():
+                new_state = self.next_state(state, class_id)
+                if new_state and new_state not in seen:
+                    if limit is not None and len(seen) >= limit:
+                        return limit
+                    seen.add(new_state)
+                    unmarked_states.append(new_state)
+        return len(seen)
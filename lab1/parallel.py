@@ -0,0 +1,87 @@
+from concurrent.futures import ProcessPoolExecutor
+import mmap
+import os
+
+from .transition_table import DEAD_STATE
+
+
+_worker_table = None
+
+
+def _set_worker_table(unanchored_table):
+    global _worker_table
+    _worker_table = unanchored_table
+
+
+# runs unanchored_table over codes once per start state. Returns {start state: (end state, number of
+# match ends)}; lanes that reach the same state are merged, so the work shrinks as lanes converge
+def transfer_function(unanchored_table, codes, start_states):
+    table = unanchored_table.table
+    finals = unanchored_table.finals
+    width = unanchored_table.width
+    byte_classes = unanchored_table.symbol_classes.byte_classes
+    class_of = unanchored_table.symbol_classes.class_of
+
+    # current state -> [match ends counted since the lanes merged, [(start state, match ends before)]]
+    lanes = {state: [0, [(state, 0)]] for state in start_states}
+    offset = 0
+    while len(lanes) > 1 and offset < len(codes):
+        code = codes[offset]
+        column = byte_classes[code] if code < 256 else class_of(code)
+        new_lanes = {}
+        for state, (count, origins) in lanes.items():
+            state = table[state * width + column]
+            if finals[state]:
+                count += 1
+            lane = new_lanes.get(state)
+            if lane is None:
+                new_lanes[state] = [count, origins]
+            else:
+                lane[1].extend((origin, before + count - lane[0]) for origin, before in origins)
+        lanes = new_lanes
+        offset += 1
+
+    result = {}
+    for state, (count, origins) in lanes.items():
+        for code in codes[offset:] if offset else codes:
+            state = table[state * width + (byte_classes[code] if code < 256 else class_of(code))]
+            if finals[state]:
+                count += 1
+        for origin, before in origins:
+            result[origin] = (state, before + count)
+    return result
+
+
+def _file_transfer_function(path, start, end, start_states):
+    with open(path, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                return transfer_function(_worker_table, view[start:end], start_states)
+            finally:
+                view.release()
+
+
+# number of offsets in the file at which some match ends: the file is cut into chunks whose transfer
+# functions are computed in a process pool, then composed starting from the initial state
+def count_file_matches(unanchored_table, path, processes=None, chunks=None):
+    processes = processes or os.cpu_count() or 1
+    chunks = chunks or processes
+    size = os.path.getsize(path)
+    initial_state = unanchored_table.initial_state
+    matches_count = unanchored_table.finals[initial_state]
+    if size == 0:
+        return matches_count
+    bounds = [size * index // chunks for index in range(chunks + 1)]
+    all_states = range(DEAD_STATE + 1, len(unanchored_table))
+    with ProcessPoolExecutor(processes, initializer=_set_worker_table, initargs=(unanchored_table,)) as executor:
+        # the first chunk is only ever entered in the initial state
+        futures = [
+            executor.submit(_file_transfer_function, path, start, end, [initial_state] if start == 0 else all_states)
+            for start, end in zip(bounds[:-1], bounds[1:]) if start < end
+        ]
+        state = initial_state
+        for future in futures:
+            state, chunk_matches = future.result()[state]
+            matches_count += chunk_matches
+    return matches_count
@@ -0,0 +1,106 @@
+from array import array
+from collections import deque
+
+from .symbol_classes import OUTSIDE_CLASS, SymbolClasses
+from .transition_table import DEAD_STATE, TransitionTable
+
+
+# accepting condition of a pair of states by whether each side accepts
+OPERATIONS = {
+    'intersection': lambda accepted_a, accepted_b: accepted_a and accepted_b,
+    'union': lambda accepted_a, accepted_b: accepted_a or accepted_b,
+    'difference': lambda accepted_a, accepted_b: accepted_a and not accepted_b,
+    'symmetric_difference': lambda accepted_a, accepted_b: accepted_a != accepted_b,
+}
+
+
+# accepts every string over alphabet; the complement of a table is universal_table(alphabet)
+# minus it, so it is taken over alphabet whatever symbols the table itself tells apart
+def universal_table(alphabet):
+    symbol_classes = SymbolClasses(alphabet)
+    width = len(symbol_classes)
+    table = array('i', [DEAD_STATE]) * (2 * width)
+    for class_id in symbol_classes.alphabet_classes():
+        table[width + class_id] = DEAD_STATE + 1
+    return TransitionTable.from_arrays(symbol_classes, DEAD_STATE + 1, bytearray([0, 1]), table)
+
+
+# classes of the common refinement of two partitions of the same alphabet, and the (class in a,
+# class in b) pair behind every joint class
+def joint_classes(symbol_classes_a, symbol_classes_b):
+    pair_classes = {(OUTSIDE_CLASS, OUTSIDE_CLASS): OUTSIDE_CLASS}
+    class_pairs = [(OUTSIDE_CLASS, OUTSIDE_CLASS)]
+    starts = []
+    interval_classes = []
+    for start in sorted(set(symbol_classes_a.starts) | set(symbol_classes_b.starts)):
+        pair = (symbol_classes_a.class_of(start), symbol_classes_b.class_of(start))
+        if pair not in pair_classes:
+            pair_classes[pair] = len(class_pairs)
+            class_pairs.append(pair)
+        if not interval_classes or interval_classes[-1] != pair_classes[pair]:
+            starts.append(start)
+            interval_classes.append(pair_classes[pair])
+    return SymbolClasses.from_intervals(starts, interval_classes), class_pairs
+
+
+# product of two compiled tables over the same alphabet, built only for the pairs reachable from
+# the initial pair; a pair from which the operation can never accept is the dead state
+def product_table(table_a, table_b, operation):
+    accepts = OPERATIONS[operation]
+    symbol_classes, class_pairs = joint_classes(table_a.symbol_classes, table_b.symbol_classes)
+    dead_a = not accepts(False, True) and not accepts(False, False)
+    dead_b = not accepts(True, False) and not accepts(False, False)
+    dead_both = not accepts(False, False)
+
+    def is_dead(state_a, state_b):
+        if state_a == DEAD_STATE and state_b == DEAD_STATE:
+            return dead_both
+        return state_a == DEAD_STATE and dead_a or state_b == DEAD_STATE and dead_b
+
+    width = len(symbol_classes)
+    initial_pair = (table_a.initial_state, table_b.initial_state)
+    pair_states = {initial_pair: DEAD_STATE + 1}
+    unmarked_pairs = deque([initial_pair])
+    rows = []
+    finals = bytearray([0])
+    while unmarked_pairs:
+        state_a, state_b = unmarked_pairs.popleft()
+        finals.append(accepts(bool(table_a.finals[state_a]), bool(table_b.finals[state_b])))
+        row = array('i', [DEAD_STATE]) * width
+        for class_id in range(OUTSIDE_CLASS + 1, width):
+            class_a, class_b = class_pairs[class_id]
+            pair = (table_a.table[state_a * table_a.width + class_a], table_b.table[state_b * table_b.width + class_b])
+            if is_dead(*pair):
+                continue
+            if pair not in pair_states:
+                pair_states[pair] = len(pair_states) + 1
+                unmarked_pairs.append(pair)
+            row[class_id] = pair_states[pair]
+        rows.append(row)
+
+    table = array('i', [DEAD_STATE]) * width
+    for row in rows:
+        table.extend(row)
+    return TransitionTable.from_arrays(symbol_classes, DEAD_STATE + 1, finals, table)
+
+
+# BFS over the table: the shortest accepted string as a list of class ids, None for an empty language
+def shortest_accepted_classes(table):
+    if table.initial_state == DEAD_STATE:
+        return None
+    parents = {table.initial_state: None}
+    queue = deque([table.initial_state])
+    while queue:
+        state = queue.popleft()
+        if table.finals[state]:
+            classes = []
+            while parents[state] is not None:
+                state, class_id = parents[state]
+                classes.append(class_id)
+            return classes[::-1]
+        for class_id in table.symbol_classes.alphabet_classes():
+            destination = table.table[state * table.width + class_id]
+            if destination != DEAD_STATE and destination not in parents:
+                parents[destination] = (state, class_id)
+                queue.append(destination)
+    return None
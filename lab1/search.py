@@ -0,0 +1,167 @@
+from array import array
+import sys
+
+from .syntax_tree import iterate_positions
+from .transition_table import DEAD_STATE, TransitionTable
+
+
+def text_codes(text):
+    if not isinstance(text, str):
+        return text
+    codes = array('I')
+    codes.frombytes(text.encode('utf-32-le' if sys.byteorder == 'little' else 'utf-32-be'))
+    return codes
+
+
+# DFA for '.*' followed by the reversed language of table: reading text backwards from its end,
+# it is in a final state at offset i iff some match of table starts at i
+def build_reverse_table(table):
+    width = table.width
+    predecessors = [[0] * table.states_count for _ in range(width)]
+    for state in range(DEAD_STATE + 1, table.states_count):
+        row = state * width
+        for class_id in range(width):
+            destination = table.table[row + class_id]
+            if destination != DEAD_STATE:
+                predecessors[class_id][destination] |= 1 << state
+    restart = sum(1 << state for state in range(DEAD_STATE + 1, table.states_count) if table.finals[state])
+    initial_mask = 1 << table.initial_state
+
+    # subset construction over sets (bitmasks) of forward states, restarting at every symbol
+    state_ids = {restart: DEAD_STATE + 1}
+    unmarked_states = [restart]
+    rows = {}
+    while unmarked_states:
+        subset = unmarked_states.pop()
+        row = [DEAD_STATE] * width
+        # symbols outside the alphabet have no predecessors and only restart
+        for class_id in range(width):
+            class_predecessors = predecessors[class_id]
+            new_subset = restart
+            for state in iterate_positions(subset):
+                new_subset |= class_predecessors[state]
+            if new_subset not in state_ids:
+                state_ids[new_subset] = len(state_ids) + 1
+                unmarked_states.append(new_subset)
+            row[class_id] = state_ids[new_subset]
+        rows[state_ids[subset]] = row
+
+    states_count = len(state_ids) + 1
+    reverse_table = array('i', [DEAD_STATE]) * (states_count * width)
+    for state, row in rows.items():
+        reverse_table[state * width:(state + 1) * width] = array('i', row)
+    finals = bytearray(states_count)
+    for subset, state in state_ids.items():
+        if subset & initial_mask:
+            finals[state] = 1
+    return TransitionTable.from_arrays(table.symbol_classes, DEAD_STATE + 1, finals, reverse_table)
+
+
+# DFA for '.*' followed by the language of table: reading text forwards, it is in a final
+# state at offset i iff some match of table ends at i
+def build_unanchored_table(table):
+    width = table.width
+    restart = 1 << table.initial_state if table.initial_state != DEAD_STATE else 0
+    final_mask = sum(1 << state for state in range(DEAD_STATE + 1, table.states_count) if table.finals[state])
+
+    state_ids = {restart: DEAD_STATE + 1}
+    unmarked_states = [restart]
+    rows = {}
+    while unmarked_states:
+        subset = unmarked_states.pop()
+        row = [DEAD_STATE] * width
+        for class_id in range(width):
+            new_subset = restart
+            for state in iterate_positions(subset):
+                destination = table.table[state * width + class_id]
+                if destination != DEAD_STATE:
+                    new_subset |= 1 << destination
+            if new_subset not in state_ids:
+                state_ids[new_subset] = len(state_ids) + 1
+                unmarked_states.append(new_subset)
+            row[class_id] = state_ids[new_subset]
+        rows[state_ids[subset]] = row
+
+    states_count = len(state_ids) + 1
+    unanchored_table = array('i', [DEAD_STATE]) * (states_count * width)
+    for state, row in rows.items():
+        unanchored_table[state * width:(state + 1) * width] = array('i', row)
+    finals = bytearray(states_count)
+    for subset, state in state_ids.items():
+        if subset & final_mask:
+            finals[state] = 1
+    return TransitionTable.from_arrays(table.symbol_classes, DEAD_STATE + 1, finals, unanchored_table)
+
+
+# starts[i] == 1 iff a match starts at offset i (pos <= i <= len(codes))
+def find_match_starts(reverse_table, codes, pos=0):
+    table = reverse_table.table
+    finals = reverse_table.finals
+    width = reverse_table.width
+    byte_classes = reverse_table.symbol_classes.byte_classes
+    class_of = reverse_table.symbol_classes.class_of
+    starts = bytearray(len(codes) + 1)
+    state = reverse_table.initial_state
+    starts[len(codes)] = finals[state]
+    for offset in range(len(codes) - 1, pos - 1, -1):
+        code = codes[offset]
+        state = table[state * width + (byte_classes[code] if code < 256 else class_of(code))]
+        starts[offset] = finals[state]
+    return starts
+
+
+# end of the longest match starting at start, None if there is none; scan_states[offset] and
+# scan_ends[offset] remember the state an earlier scan was in at offset and the longest end it
+# found from there on: a scan that meets it in the same state would read the same text, so it
+# stops and takes that answer (scans of successive matches merge instead of rereading the text)
+def longest_match_end(forward_table, codes, start, scan_states=None, scan_ends=None):
+    table = forward_table.table
+    finals = forward_table.finals
+    width = forward_table.width
+    byte_classes = forward_table.symbol_classes.byte_classes
+    class_of = forward_table.symbol_classes.class_of
+    if scan_states is None:
+        scan_states = array('i', [DEAD_STATE]) * (len(codes) + 1)
+        scan_ends = array('i', [-1]) * (len(codes) + 1)
+    state = forward_table.initial_state
+    path = []
+    offset = start
+    end = -1
+    while True:
+        if scan_states[offset] == state:
+            end = scan_ends[offset]
+            break
+        path.append(state)
+        if offset == len(codes):
+            break
+        code = codes[offset]
+        state = table[state * width + (byte_classes[code] if code < 256 else class_of(code))]
+        offset += 1
+        if state == DEAD_STATE:
+            break
+    for offset in range(start + len(path) - 1, start - 1, -1):
+        state = path[offset - start]
+        if end == -1 and finals[state]:
+            end = offset
+        scan_states[offset] = state
+        scan_ends[offset] = end
+    return None if end == -1 else end
+
+
+# leftmost-longest, non-overlapping (start, end) matches; an empty match is followed by a step forward
+# each forward scan runs until the DFA dies or meets an earlier scan in the same state; at worst
+# (scans of successive matches never meet in the same state) it rereads the rest of the text per
+# match, O(len(text) * matches), but e.g. 'a|a*b' over 'a' * n, which reaches the end of the text
+# from every match, takes O(n)
+def finditer(forward_table, reverse_table, text, pos=0):
+    codes = text_codes(text)
+    starts = find_match_starts(reverse_table, codes, pos)
+    scan_states = array('i', [DEAD_STATE]) * (len(codes) + 1)
+    scan_ends = array('i', [-1]) * (len(codes) + 1)
+    while pos <= len(codes):
+        start = starts.find(1, pos)
+        if start == -1:
+            return
+        end = longest_match_end(forward_table, codes, start, scan_states, scan_ends)
+        yield start, end
+        pos = end if end > start else start + 1
@@ -0,0 +1,55 @@
+import mmap
+
+
+class StreamMatcher:
+    # runs the unanchored ('.*'-prefixed) automaton over text given in chunks; the state is carried
+    # from one feed() to the next, so a match may span any number of chunk boundaries.
+    # feed() returns the absolute offsets at which some match ends
+    def __init__(self, unanchored_table):
+        self.table = unanchored_table
+        self.reset()
+
+    def reset(self):
+        self.state = self.table.initial_state
+        self.offset = 0
+        self.matches_count = 0
+        # an empty match ends before the first symbol
+        self.pending_empty_match = bool(self.table.finals[self.state])
+
+    def feed(self, chunk):
+        table = self.table.table
+        finals = self.table.finals
+        width = self.table.width
+        byte_classes = self.table.symbol_classes.byte_classes
+        class_of = self.table.symbol_classes.class_of
+        state = self.state
+        offset = self.offset
+        ends = []
+        if self.pending_empty_match:
+            ends.append(offset)
+            self.pending_empty_match = False
+        for code in map(ord, chunk) if isinstance(chunk, str) else chunk:
+            state = table[state * width + (byte_classes[code] if code < 256 else class_of(code))]
+            offset += 1
+            if finals[state]:
+                ends.append(offset)
+        self.state = state
+        self.offset = offset
+        self.matches_count += len(ends)
+        return ends
+
+
+# yields match end offsets in the file at path; chunks are memoryview slices of the mapping, not copies
+def scan_file(unanchored_table, path, chunk_size=1 << 20):
+    matcher = StreamMatcher(unanchored_table)
+    with open(path, 'rb') as file:
+        if not file.seek(0, 2):
+            yield from matcher.feed(b'')
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                for start in range(0, len(view), chunk_size):
+                    yield from matcher.feed(view[start:start + chunk_size])
+            finally:
+                view.release()
@@ -0,0 +1,124 @@
+from bisect import bisect_right
+
+
+MAX_CODE_POINT = 0x10FFFF
+
+# alphabets may be given as sets of characters or as inclusive code point ranges
+BYTE_ALPHABET = ((0, 0xFF),)
+UNICODE_ALPHABET = ((0, MAX_CODE_POINT),)
+
+OUTSIDE_CLASS = 0
+
+
+def to_ranges(symbols):
+    if isinstance(symbols, str) and len(symbols) == 1:
+        return ((ord(symbols), ord(symbols)),)
+    points = []
+    for symbol in symbols:
+        if isinstance(symbol, str):
+            points.append((ord(symbol), ord(symbol)))
+        else:
+            points.append(tuple(symbol))
+    ranges = []
+    for low, high in sorted(points):
+        if ranges and low <= ranges[-1][1] + 1:
+            ranges[-1] = (ranges[-1][0], max(ranges[-1][1], high))
+        else:
+            ranges.append((low, high))
+    return tuple(ranges)
+
+
+def describe_ranges(ranges):
+    return ''.join(
+        repr(chr(low)) if low == high else '{}-{}'.format(repr(chr(low)), repr(chr(high)))
+        for low, high in ranges
+    )
+
+
+class SymbolClasses:
+    # partitions code points into classes that no symbol tells apart: two code points share a
+    # class iff both are (or both are not) in the alphabet and are matched by the same symbols;
+    # OUTSIDE_CLASS holds everything outside the alphabet and always leads to the dead state
+    def __init__(self, alphabet, symbols=()):
+        alphabet = to_ranges(alphabet)
+        symbols = list(dict.fromkeys(symbols))
+        events = {0: [], MAX_CODE_POINT + 1: []}
+        for owner, ranges in [(None, alphabet)] + [(symbol, to_ranges(symbol)) for symbol in symbols]:
+            for low, high in ranges:
+                events.setdefault(low, []).append((owner, 1))
+                events.setdefault(high + 1, []).append((owner, -1))
+
+        self.classes_of_symbol = {symbol: set() for symbol in symbols}
+        signature_classes = {}
+        self.starts = []
+        self.interval_classes = []
+        alphabet_depth = 0
+        active_symbols = set()
+        points = sorted(events)
+        for start, end in zip(points[:-1], points[1:]):
+            for owner, delta in events[start]:
+                if owner is None:
+                    alphabet_depth += delta
+                elif delta > 0:
+                    active_symbols.add(owner)
+                else:
+                    active_symbols.discard(owner)
+            if alphabet_depth:
+                signature = frozenset(active_symbols)
+                if signature not in signature_classes:
+                    signature_classes[signature] = len(signature_classes) + 1
+                    for symbol in signature:
+                        self.classes_of_symbol[symbol].add(signature_classes[signature])
+                class_id = signature_classes[signature]
+            else:
+                class_id = OUTSIDE_CLASS
+            if not self.interval_classes or self.interval_classes[-1] != class_id:
+                self.starts.append(start)
+                self.interval_classes.append(class_id)
+        self.count = len(signature_classes) + 1
+        self._build_byte_classes()
+
+    @classmethod
+    def from_intervals(cls, starts, interval_classes):
+        self = cls.__new__(cls)
+        self.starts = list(starts)
+        self.interval_classes = list(interval_classes)
+        self.classes_of_symbol = {}
+        self.count = max(self.interval_classes, default=OUTSIDE_CLASS) + 1
+        self._build_byte_classes()
+        return self
+
+    def _build_byte_classes(self):
+        self.byte_classes = [self._lookup(code) for code in range(256)]
+
+    def _lookup(self, code):
+        return self.interval_classes[bisect_right(self.starts, code) - 1]
+
+    # class of a character or an int code point (e.g. a byte)
+    def class_of(self, symbol):
+        code = ord(symbol) if isinstance(symbol, str) else symbol
+        if 0 <= code < 256:
+            return self.byte_classes[code]
+        if not 0 <= code <= MAX_CODE_POINT:
+            return OUTSIDE_CLASS
+        return self._lookup(code)
+
+    def alphabet_classes(self):
+        return range(OUTSIDE_CLASS + 1, self.count)
+
+    def ranges(self, class_id):
+        ends = self.starts[1:] + [MAX_CODE_POINT + 1]
+        return tuple(
+            (start, end - 1)
+            for start, end, interval_class in zip(self.starts, ends, self.interval_classes)
+            if interval_class == class_id
+        )
+
+    def representative(self, class_id):
+        return chr(self.ranges(class_id)[0][0])
+
+    def describe(self, class_id):
+        return '[{}]'.format(describe_ranges(self.ranges(class_id)))
+
+    def __len__(self):
+        return self.count
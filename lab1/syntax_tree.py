@@ -1,11 +1,145 @@
-from collections import deque
+from .symbol_classes import MAX_CODE_POINT, to_ranges
 
 
-def is_operator(char):
-    return char in '|*.'
+SYMBOL = 'symbol'
+EMPTY = 'ε'
+OPERATOR_PRIORITY = {'|': 0, '.': 1}
+REPETITIONS = '*+?{'
+
+
+# (kind, symbol) pairs: kind is SYMBOL or the operator / parenthesis itself.
+# A character class is one SYMBOL whose symbol is a tuple of inclusive code point ranges,
+# a '{' token carries (min, max) with max None for '{m,}'
+def tokenize(regexp):
+    chars = iter(regexp)
+    for char in chars:
+        if char == '\\':
+            yield SYMBOL, _escaped(chars, regexp)
+        elif char == '[':
+            yield SYMBOL, _character_class(chars, regexp)
+        elif char == '{':
+            yield char, _bounds(chars, regexp)
+        elif char in '|*+?.()':
+            yield char, char
+        elif char in ']}':
+            raise ValueError('Unbalanced {!r} in {!r}'.format(char, regexp))
+        else:
+            yield SYMBOL, char
+
+
+def _escaped(chars, regexp):
+    char = next(chars, None)
+    if char is None:
+        raise ValueError('Dangling escape at the end of {!r}'.format(regexp))
+    return char
+
+
+# [abc], [a-z0-9], [^\n]: '^' first negates, '-' first or last is literal, '\\' escapes
+def _character_class(chars, regexp):
+    negated = False
+    points = []
+    pending_range = False
+    range_start = None
+    for char in chars:
+        if char == ']' and points:
+            break
+        if char == '^' and not points and not negated:
+            negated = True
+            continue
+        if char == '-' and range_start is not None:
+            pending_range = True
+            range_start = None
+            continue
+        code = ord(_escaped(chars, regexp) if char == '\\' else char)
+        if pending_range:
+            low = points.pop()[0]
+            if low > code:
+                raise ValueError('Invalid range {!r}-{!r} in {!r}'.format(chr(low), chr(code), regexp))
+            points.append((low, code))
+            pending_range = False
+        else:
+            points.append((code, code))
+            range_start = code
+    else:
+        raise ValueError('Unbalanced [ in {!r}'.format(regexp))
+    if pending_range:
+        points.append((ord('-'), ord('-')))
+    ranges = to_ranges(points)
+    if negated:
+        ends = [low - 1 for low, _ in ranges] + [MAX_CODE_POINT]
+        starts = [0] + [high + 1 for _, high in ranges]
+        ranges = tuple((low, high) for low, high in zip(starts, ends) if low <= high)
+        if not ranges:
+            raise ValueError('Empty character class in {!r}'.format(regexp))
+    if len(ranges) == 1 and ranges[0][0] == ranges[0][1]:
+        return chr(ranges[0][0])
+    return ranges
+
+
+# {m}, {m,}, {m,n} and {,n} (= {0,n}); x{0} and x{0,0} match only the empty string
+def _bounds(chars, regexp):
+    text = ''
+    for char in chars:
+        if char == '}':
+            break
+        text += char
+    else:
+        raise ValueError('Unbalanced {{ in {!r}'.format(regexp))
+    low, comma, high = text.partition(',')
+    if comma and not low:
+        low = '0' if high else low
+    if not low.isdigit() or high and not high.isdigit():
+        raise ValueError('Invalid repetition {{{}}} in {!r}'.format(text, regexp))
+    bounds = (int(low), int(high) if high else None if comma else int(low))
+    if bounds[1] is not None and bounds[1] < bounds[0]:
+        raise ValueError('Invalid repetition {{{}}} in {!r}'.format(text, regexp))
+    return bounds
+
+
+# sets of positions in DFA states are int bitmasks: bit i is set when position i is in the set
+def iterate_positions(positions):
+    while positions:
+        lowest = positions & -positions
+        yield lowest.bit_length() - 1
+        positions ^= lowest
+
+
+# the syntax tree keeps its position sets as (base, mask) pairs instead: position base + i is in
+# the set when bit i of mask is set, and base is the lowest member. A set then costs the span of
+# its members rather than its highest position, which keeps the tree linear for long patterns
+EMPTY_POSITIONS = (0, 0)
+
+
+def union_positions(left, right):
+    if not right[1]:
+        return left
+    if not left[1]:
+        return right
+    if left[0] > right[0]:
+        left, right = right, left
+    return left[0], left[1] | right[1] << (right[0] - left[0])
+
+
+# the int bitmask of a (base, mask) pair
+def positions_mask(positions):
+    return positions[1] << positions[0]
+
+
+def iterate_position_set(positions):
+    base, mask = positions
+    for position in iterate_positions(mask):
+        yield base + position
+
+
+def positions_set(positions):
+    return set(iterate_position_set(positions))
 
 
 class SyntaxNode:
+    # no per-node __dict__: long patterns build tens of thousands of nodes. firstpos and lastpos
+    # of interior nodes are dropped (None) once their parent is built
+    __slots__ = ('symbol', 'position', 'left', 'right', 'nullable', 'firstpos', 'lastpos', 'followpos')
+
     def __init__(self, symbol, position=None, left=None, right=None, nullable=None, firstpos=None, lastpos=None):
         self.symbol = symbol
         self.position = position
@@ -14,7 +148,7 @@ class SyntaxNode:
         self.nullable = nullable
         self.firstpos = firstpos
         self.lastpos = lastpos
-        self.followpos = set()
+        self.followpos = EMPTY_POSITIONS
 
     def __str__(self):
         return '{}s: {}; p: {}, n: {}, f: {}, l: {}, follow: {}\n{}'.format(
@@ -22,100 +156,214 @@ class SyntaxNode:
             self.symbol,
             self.position,
             self.nullable,
-            self.firstpos,
-            self.lastpos,
-            self.followpos,
+            positions_set(self.firstpos) if self.firstpos is not None else '-',
+            positions_set(self.lastpos) if self.lastpos is not None else '-',
+            positions_set(self.followpos),
             self.right if self.right is not None else '',
         )
 
 
 class SyntaxTree:
-    # '#' expected at the end of regexp, '|', '*', '.', '#' should be escaped
-    def __init__(self, postfix_regexp):
+    # regexp is an infix regexp or a list of them, the tree is built for (r0)#|(r1)#|...;
+    # '|', '*', '+', '?', '{', '}', '[', ']', '.' (explicit concatenation), '(', ')', '\'
+    # should be escaped with '\', a character class [...] is a single position;
+    # a '#' in a pattern is a plain symbol: the only end markers are the ones appended here,
+    # one per pattern, and marker_positions lists them in pattern order
+    def __init__(self, regexp):
         self.position_nodes = []
-        followpos_nodes = []
-        stack = deque()
-        skip_next = False
-        postfix_regexp += '#'  # meaningless character for next loop
-        current_position = 0
-        for current_char, next_char in zip(postfix_regexp[:-1], postfix_regexp[1:]):
-            if skip_next:
-                skip_next = False
-                continue
-            if current_char == '\\':
-                current_char = next_char
-                skip_next = True
-            if not is_operator(current_char) or skip_next:
-                stack.append(
-                    SyntaxNode(
-                        current_char,
-                        position=current_position,
-                        left=None,
-                        right=None,
-                        nullable=False,
-                        firstpos=set([current_position]),
-                        lastpos=set([current_position])
-                    )
-                )
-                self.position_nodes.append(stack[-1])
-                current_position += 1
-            elif current_char == '|':
-                right_node = stack.pop()
-                left_node = stack.pop()
-                stack.append(
-                    SyntaxNode(
-                        current_char,
-                        position=None,
-                        left=left_node,
-                        right=right_node,
-                        nullable=left_node.nullable or right_node.nullable,
-                        firstpos=left_node.firstpos.union(right_node.firstpos),
-                        lastpos=left_node.lastpos.union(right_node.lastpos)
-                    )
-                )
-            elif current_char == '.':
-                right_node = stack.pop()
-                left_node = stack.pop()
-                stack.append(
-                    SyntaxNode(
-                        current_char,
-                        position=None,
-                        left=left_node,
-                        right=right_node,
-                        nullable=left_node.nullable and right_node.nullable,
-                        firstpos=left_node.firstpos.union(right_node.firstpos) if left_node.nullable else left_node.firstpos,
-                        lastpos=left_node.lastpos.union(right_node.lastpos) if right_node.nullable else right_node.lastpos
-                    )
-                )
-                followpos_nodes.append(stack[-1])
-            elif current_char == '*':
-                right_node = stack.pop()
-                stack.append(
-                    SyntaxNode(
-                        current_char,
-                        position=None,
-                        left=None,
-                        right=right_node,
-                        nullable=True,
-                        firstpos=right_node.firstpos,
-                        lastpos=right_node.lastpos
-                    )
-                )
-                followpos_nodes.append(stack[-1])
-        self.root = stack.pop()
-        for node in followpos_nodes:
-            if node.symbol == '.':
-                for position in node.left.lastpos:
-                    self.position_nodes[position].followpos = self.position_nodes[position].followpos.union(node.right.firstpos)
-            elif node.symbol == '*':
-                for position in node.right.lastpos:
-                    self.position_nodes[position].followpos = self.position_nodes[position].followpos.union(node.right.firstpos)
+        self.marker_positions = []
+        self.root = None
+        for regexp in [regexp] if isinstance(regexp, str) else regexp:
+            pattern_node = self._concatenation(self._parse(regexp), self._leaf('#', marker=True))
+            self.root = pattern_node if self.root is None else self._alternation(self.root, pattern_node)
+        if self.root is None:
+            raise ValueError('No patterns')
+
+    # shunting-yard over the tokens, reducing operators straight into tree nodes
+    def _parse(self, regexp):
+        operands = []
+        operators = []
+        expect_operand = True
+        for kind, symbol in tokenize(regexp):
+            if kind in (SYMBOL, '('):
+                if not expect_operand:
+                    self._push_operator(operands, operators, '.')
+                if kind == '(':
+                    operators.append('(')
+                    expect_operand = True
+                else:
+                    operands.append(self._leaf(symbol))
+                    expect_operand = False
+            elif expect_operand:
+                raise ValueError('Missing operand before {!r} in {!r}'.format(symbol, regexp))
+            elif kind in REPETITIONS:
+                operands.append(self._repetition(operands.pop(), kind, symbol))
+            elif kind == ')':
+                while operators and operators[-1] != '(':
+                    self._reduce(operands, operators.pop())
+                if not operators:
+                    raise ValueError('Invalid parentheses')
+                operators.pop()
+            else:
+                self._push_operator(operands, operators, kind)
+                expect_operand = True
+        if expect_operand:
+            raise ValueError('Missing operand at the end of {!r}'.format(regexp))
+        while operators:
+            operator = operators.pop()
+            if operator == '(':
+                raise ValueError('Invalid parentheses')
+            self._reduce(operands, operator)
+        return operands.pop()
+
+    def _push_operator(self, operands, operators, operator):
+        while operators and operators[-1] != '(' and OPERATOR_PRIORITY[operators[-1]] >= OPERATOR_PRIORITY[operator]:
+            self._reduce(operands, operators.pop())
+        operators.append(operator)
+
+    def _reduce(self, operands, operator):
+        right_node = operands.pop()
+        left_node = operands.pop()
+        if operator == '|':
+            operands.append(self._alternation(left_node, right_node))
+        else:
+            operands.append(self._concatenation(left_node, right_node))
+
+    def _leaf(self, symbol, marker=False):
+        position = len(self.position_nodes)
+        positions = (position, 1)
+        node = SyntaxNode(symbol, position=position, nullable=False, firstpos=positions, lastpos=positions)
+        self.position_nodes.append(node)
+        if marker:
+            self.marker_positions.append(position)
+        return node
+
+    # nothing reads the firstpos and lastpos of a node again once its parent has them
+    @staticmethod
+    def _release(*children):
+        for child in children:
+            if child.position is None:
+                child.firstpos = child.lastpos = None
+
+    def _alternation(self, left_node, right_node):
+        node = SyntaxNode(
+            '|',
+            left=left_node,
+            right=right_node,
+            nullable=left_node.nullable or right_node.nullable,
+            firstpos=union_positions(left_node.firstpos, right_node.firstpos),
+            lastpos=union_positions(left_node.lastpos, right_node.lastpos)
+        )
+        self._release(left_node, right_node)
+        return node
+
+    def _add_followpos(self, positions, followpos):
+        position_nodes = self.position_nodes
+        for position in iterate_position_set(positions):
+            position_node = position_nodes[position]
+            position_node.followpos = union_positions(position_node.followpos, followpos)
+
+    # followpos is final as soon as both children are, so it is filled in while building
+    def _concatenation(self, left_node, right_node):
+        self._add_followpos(left_node.lastpos, right_node.firstpos)
+        node = SyntaxNode(
+            '.',
+            left=left_node,
+            right=right_node,
+            nullable=left_node.nullable and right_node.nullable,
+            firstpos=union_positions(left_node.firstpos, right_node.firstpos) if left_node.nullable else left_node.firstpos,
+            lastpos=union_positions(left_node.lastpos, right_node.lastpos) if right_node.nullable else right_node.lastpos
+        )
+        self._release(left_node, right_node)
+        return node
+
+    def _repetition(self, node, kind, bounds):
+        if kind == '*':
+            return self._star(node)
+        if kind == '+':
+            return self._plus(node)
+        if kind == '?':
+            return self._optional(node)
+        # x{m,n} is m copies of x followed by n - m copies of x?, x{m,} ends with x+ (or is x* for m = 0);
+        # x{0} leaves the positions of x unreachable
+        low, high = bounds
+        if high == 0:
+            return self._empty()
+        copies = [node] + [self._clone(node) for _ in range(max(low, high or 1) - 1)]
+        if high is None:
+            copies[-1] = self._plus(copies[-1]) if low else self._star(copies[-1])
+        else:
+            copies[low:] = [self._optional(copy) for copy in copies[low:]]
+        result = copies[0]
+        for copy in copies[1:]:
+            result = self._concatenation(result, copy)
+        return result
+
+    # a copy of the subtree with new positions, built bottom-up so followpos is recomputed
+    def _clone(self, node):
+        stack = [(node, False)]
+        copies = []
+        while stack:
+            node, children_done = stack.pop()
+            if node.position is not None:
+                copies.append(self._leaf(node.symbol))
+            elif node.symbol == EMPTY:
+                copies.append(self._empty())
+            elif not children_done:
+                stack.append((node, True))
+                stack.extend((child, False) for child in (node.right, node.left) if child is not None)
+            elif node.symbol in ('|', '.'):
+                right_copy = copies.pop()
+                copies.append((self._alternation if node.symbol == '|' else self._concatenation)(copies.pop(), right_copy))
+            else:
+                copies.append(self._repetition(copies.pop(), node.symbol, None))
+        return copies.pop()
+
+    # matches only the empty string
+    def _empty(self):
+        return SyntaxNode(EMPTY, nullable=True, firstpos=EMPTY_POSITIONS, lastpos=EMPTY_POSITIONS)
+
+    def _star(self, right_node):
+        self._add_followpos(right_node.lastpos, right_node.firstpos)
+        node = SyntaxNode(
+            '*',
+            right=right_node,
+            nullable=True,
+            firstpos=right_node.firstpos,
+            lastpos=right_node.lastpos
+        )
+        self._release(right_node)
+        return node
+
+    # x+ has the followpos of x* but is nullable only when x is
+    def _plus(self, right_node):
+        self._add_followpos(right_node.lastpos, right_node.firstpos)
+        node = SyntaxNode(
+            '+',
+            right=right_node,
+            nullable=right_node.nullable,
+            firstpos=right_node.firstpos,
+            lastpos=right_node.lastpos
+        )
+        self._release(right_node)
+        return node
+
+    def _optional(self, right_node):
+        node = SyntaxNode(
+            '?',
+            right=right_node,
+            nullable=True,
+            firstpos=right_node.firstpos,
+            lastpos=right_node.lastpos
+        )
+        self._release(right_node)
+        return node
 
     def __str__(self):
         return 'Root Symbol: {}\n{}'.format(self.root.symbol, str(self.root))
 
 
 if __name__ == '__main__':
-    s = 'ab|*a.b.b.#.'
+    s = '(a|b)*abb'
     tree = SyntaxTree(s)
     print(tree)
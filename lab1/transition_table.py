@@ -0,0 +1,305 @@
+from array import array
+from collections import namedtuple
+from collections.abc import Mapping
+from hashlib import sha256
+from itertools import islice
+import mmap as mmap_module
+import struct
+import sys
+
+from .symbol_classes import SymbolClasses, to_ranges
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+TransitionKey = namedtuple('TransitionKey', ['state', 'symbol'])
+
+DEAD_STATE = 0
+
+# columns simulate_many() converts to symbol classes at once; a length group with fewer inputs
+# than VECTORIZED_ROWS is matched by simulate() instead, stepping a few rows costs more than it saves
+COLUMN_BLOCK = 64
+VECTORIZED_ROWS = 32
+
+# file layout: header, native uint32 alphabet ranges and symbol class intervals, native int32
+# transition table, utf-8 regexp, final bitmap; BYTE_ORDER_MARK catches foreign byte order
+FILE_MAGIC = b'LDFA'
+FILE_VERSION = 2
+BYTE_ORDER_MARK = 0x01020304
+HEADER = struct.Struct('=4sHHI32sIIIIII')
+
+
+class TransitionTable:
+    # dense form of a DFA: state ids are row numbers, symbol class ids are columns,
+    # row DEAD_STATE is the (implicit) fake state every missing transition leads to;
+    # accepting maps final states to the ids of the patterns they accept
+    def __init__(self, symbol_classes, states, initial_state, accepting, transitions, dead_state=None):
+        self.symbol_classes = symbol_classes
+        self.width = len(symbol_classes)
+
+        self.state_ids = {} if dead_state is None else {dead_state: DEAD_STATE}
+        self.states_count = DEAD_STATE + 1
+        for state in states:
+            if state not in self.state_ids:
+                self.state_ids[state] = self.states_count
+                self.states_count += 1
+
+        self.initial_state = self.state_ids.get(initial_state, DEAD_STATE)
+        self.finals = bytearray(self.states_count)
+        self.accepts = [()] * self.states_count
+        for state, patterns in accepting.items():
+            if state in self.state_ids:
+                self.finals[self.state_ids[state]] = 1
+                self.accepts[self.state_ids[state]] = tuple(sorted(patterns))
+
+        self.table = array('i', [DEAD_STATE]) * (self.states_count * self.width)
+        for transition_key, destination in transitions.items():
+            state_id = self.state_ids.get(transition_key.state)
+            if state_id is None:
+                continue
+            self.table[state_id * self.width + transition_key.symbol] = self.state_ids.get(destination, DEAD_STATE)
+
+    @classmethod
+    def from_arrays(cls, symbol_classes, initial_state, finals, table):
+        self = cls.__new__(cls)
+        self.symbol_classes = symbol_classes
+        self.width = len(symbol_classes)
+        self.state_ids = None  # rows are already dense state ids
+        self.states_count = len(finals)
+        self.initial_state = initial_state
+        self.finals = finals
+        self.accepts = [(0,) if final else () for final in finals]
+        self.table = table
+        return self
+
+    # symbol is a character or an int code point
+    def next_state(self, state, symbol):
+        return self.table[state * self.width + self.symbol_classes.class_of(symbol)]
+
+    # text is a str or a bytes-like object (matched byte by byte)
+    def simulate(self, text):
+        table = self.table
+        finals = self.finals
+        width = self.width
+        byte_classes = self.symbol_classes.byte_classes
+        class_of = self.symbol_classes.class_of
+        state = self.initial_state
+        for code in map(ord, text) if isinstance(text, str) else text:
+            if finals[state]:
+                return True
+            state = table[state * width + (byte_classes[code] if code < 256 else class_of(code))]
+            if state == DEAD_STATE:
+                return False
+        return finals[state] == 1
+
+    # whether the whole of text is in the language (simulate() accepts once any prefix is)
+    def fullmatch(self, text):
+        table = self.table
+        width = self.width
+        byte_classes = self.symbol_classes.byte_classes
+        class_of = self.symbol_classes.class_of
+        state = self.initial_state
+        for code in map(ord, text) if isinstance(text, str) else text:
+            state = table[state * width + (byte_classes[code] if code < 256 else class_of(code))]
+            if state == DEAD_STATE:
+                return False
+        return self.finals[state] == 1
+
+    def match_patterns(self, text):
+        table = self.table
+        accepts = self.accepts
+        width = self.width
+        byte_classes = self.symbol_classes.byte_classes
+        class_of = self.symbol_classes.class_of
+        state = self.initial_state
+        matched = set(accepts[state])
+        for code in map(ord, text) if isinstance(text, str) else text:
+            state = table[state * width + (byte_classes[code] if code < 256 else class_of(code))]
+            if state == DEAD_STATE:
+                break
+            matched.update(accepts[state])
+        return matched
+
+    # one boolean per input: numpy bool array when numpy is available, list otherwise
+    def simulate_many(self, texts):
+        if numpy is not None:
+            return self._simulate_vectorized(texts)
+        simulate = self.simulate
+        return [simulate(text) for text in texts]
+
+    def simulate_iter(self, texts, batch_size=4096):
+        texts = iter(texts)
+        while True:
+            batch = list(islice(texts, batch_size))
+            if not batch:
+                return
+            yield from self.simulate_many(batch)
+
+    # advances inputs (str or bytes) by one symbol per step over padded code point matrices.
+    # Inputs are grouped by length, so a group is padded to at most twice its shortest input and
+    # one long input does not widen every row; lengths are taken with len() before the conversion:
+    # fixed-width numpy strings drop trailing NULs, so str_len() would cut inputs like b'ab\0'
+    # short (an S/U array passed in has lost them already)
+    def _simulate_vectorized(self, texts):
+        if isinstance(texts, numpy.ndarray) and texts.dtype.kind in 'SU':
+            lengths = numpy.char.str_len(texts)
+        else:
+            texts = list(texts)
+            lengths = numpy.fromiter(map(len, texts), dtype=numpy.intp, count=len(texts))
+        count = len(lengths)
+        accepted = numpy.full(count, bool(self.finals[self.initial_state]))
+        if count == 0 or self.finals[self.initial_state]:
+            return accepted
+
+        # an extra column keeps the state once an input is over
+        table = numpy.empty((self.states_count, self.width + 1), dtype=numpy.intp)
+        table[:, :self.width] = numpy.frombuffer(self.table, dtype=numpy.intc).reshape(self.states_count, self.width)
+        table[:, self.width] = numpy.arange(self.states_count)
+        finals = numpy.frombuffer(bytes(self.finals), dtype=numpy.uint8).astype(bool)
+
+        order = numpy.argsort(lengths, kind='stable')
+        sorted_lengths = lengths[order]
+        low = int(numpy.searchsorted(sorted_lengths, 1))
+        while low < count:
+            high = int(numpy.searchsorted(sorted_lengths, 2 * sorted_lengths[low]))
+            indices = order[low:high]
+            if len(indices) < VECTORIZED_ROWS:
+                accepted[indices] = [self.simulate(texts[index]) for index in indices]
+            else:
+                codes = self._group_codes(texts, indices, int(sorted_lengths[high - 1]))
+                accepted[indices] = self._simulate_group(table, finals, codes, lengths[indices])
+            low = high
+        return accepted
+
+    # code point matrix of texts[indices], padded to width
+    def _group_codes(self, texts, indices, width):
+        if isinstance(texts, numpy.ndarray):
+            group = texts[indices].astype('{}{}'.format(texts.dtype.kind, width))
+        else:
+            group = numpy.asarray([texts[index] for index in indices])
+            if group.dtype.kind not in 'SU':
+                group = group.astype(str)
+        return group.view(numpy.uint8 if group.dtype.kind == 'S' else numpy.uint32).reshape(len(indices), -1)
+
+    # steps over COLUMN_BLOCK columns at a time; rows that are over, dead or already accepted are
+    # dropped between blocks
+    def _simulate_group(self, table, finals, codes, lengths):
+        starts = numpy.array(self.symbol_classes.starts, dtype=numpy.uint32)
+        interval_classes = numpy.array(self.symbol_classes.interval_classes, dtype=numpy.intp)
+        accepted = numpy.zeros(len(codes), dtype=bool)
+        rows = numpy.arange(len(codes))
+        states = numpy.full(len(codes), self.initial_state, dtype=numpy.intp)
+        for block_start in range(0, codes.shape[1], COLUMN_BLOCK):
+            block = codes[rows, block_start:block_start + COLUMN_BLOCK]
+            columns = interval_classes[numpy.searchsorted(starts, block, side='right') - 1]
+            columns[block_start + numpy.arange(block.shape[1]) >= lengths[rows, None]] = self.width
+            for position in range(block.shape[1]):
+                states = table[states, columns[:, position]]
+                hits = finals[states]
+                if hits.any():
+                    accepted[rows[hits]] = True
+            live = ~accepted[rows] & (states != DEAD_STATE) & (lengths[rows] > block_start + COLUMN_BLOCK)
+            rows = rows[live]
+            states = states[live]
+            if not len(rows):
+                break
+        return accepted
+
+    def __len__(self):
+        return self.states_count
+
+
+# read-only TransitionKey -> state view of a table, missing keys lead to the dead state
+class TransitionsView(Mapping):
+    def __init__(self, transition_table):
+        self.transition_table = transition_table
+
+    def __getitem__(self, transition_key):
+        transition_table = self.transition_table
+        if not (0 < transition_key.state < transition_table.states_count and 0 <= transition_key.symbol < transition_table.width):
+            raise KeyError(transition_key)
+        destination = transition_table.table[transition_key.state * transition_table.width + transition_key.symbol]
+        if destination == DEAD_STATE:
+            raise KeyError(transition_key)
+        return destination
+
+    def __iter__(self):
+        transition_table = self.transition_table
+        for state in range(DEAD_STATE + 1, transition_table.states_count):
+            row = state * transition_table.width
+            for class_id in transition_table.symbol_classes.alphabet_classes():
+                if transition_table.table[row + class_id] != DEAD_STATE:
+                    yield TransitionKey(state, class_id)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+def source_checksum(regexp, alphabet):
+    return sha256('{}\0{}'.format(regexp, to_ranges(alphabet)).encode('utf-8')).digest()
+
+
+def save_table(path, transition_table, regexp, alphabet):
+    alphabet = to_ranges(alphabet)
+    symbol_classes = transition_table.symbol_classes
+    encoded_regexp = regexp.encode('utf-8')
+    with open(path, 'wb') as output:
+        output.write(HEADER.pack(
+            FILE_MAGIC, FILE_VERSION, 0, BYTE_ORDER_MARK,
+            source_checksum(regexp, alphabet),
+            len(alphabet), len(symbol_classes.starts), transition_table.width,
+            transition_table.states_count, transition_table.initial_state, len(encoded_regexp),
+        ))
+        output.write(array('I', [code for code_range in alphabet for code in code_range]).tobytes())
+        output.write(array('I', symbol_classes.starts).tobytes())
+        output.write(array('I', symbol_classes.interval_classes).tobytes())
+        output.write(transition_table.table.tobytes())
+        output.write(encoded_regexp)
+        output.write(bytes(transition_table.finals))
+
+
+# returns (transition table, regexp, alphabet ranges); with use_mmap the table and
+# final bitmap are views into a shared read-only mapping of the file
+def load_table(path, use_mmap=True):
+    with open(path, 'rb') as source:
+        if use_mmap:
+            data = memoryview(mmap_module.mmap(source.fileno(), 0, access=mmap_module.ACCESS_READ))
+        else:
+            data = memoryview(source.read())
+    if len(data) < HEADER.size:
+        raise ValueError('{}: truncated DFA file'.format(path))
+    (
+        magic, version, _, byte_order_mark, checksum,
+        alphabet_size, intervals_count, width, states_count, initial_state, regexp_size,
+    ) = HEADER.unpack_from(data)
+    if magic != FILE_MAGIC or version != FILE_VERSION:
+        raise ValueError('{}: not a DFA file of version {}'.format(path, FILE_VERSION))
+    if byte_order_mark != BYTE_ORDER_MARK:
+        raise ValueError('{}: DFA file was written with {} byte order'.format(path, 'big' if sys.byteorder == 'little' else 'little'))
+    expected_size = HEADER.size + 4 * (2 * alphabet_size + 2 * intervals_count + states_count * width) + regexp_size + states_count
+    if len(data) != expected_size or not 0 <= initial_state < states_count:
+        raise ValueError('{}: corrupted DFA file'.format(path))
+
+    def take(size):
+        nonlocal offset
+        offset += size
+        return data[offset - size:offset]
+
+    offset = HEADER.size
+    alphabet_codes = take(8 * alphabet_size).cast('I')
+    alphabet = tuple(zip(alphabet_codes[0::2], alphabet_codes[1::2]))
+    starts = take(4 * intervals_count).cast('I')
+    interval_classes = take(4 * intervals_count).cast('I')
+    table = take(4 * states_count * width).cast('i')
+    regexp = str(take(regexp_size), 'utf-8')
+    finals = take(states_count)
+    if source_checksum(regexp, alphabet) != checksum:
+        raise ValueError('{}: checksum mismatch'.format(path))
+
+    symbol_classes = SymbolClasses.from_intervals(starts, interval_classes)
+    if len(symbol_classes) != width:
+        raise ValueError('{}: corrupted DFA file'.format(path))
+    return TransitionTable.from_arrays(symbol_classes, initial_state, finals, table), regexp, alphabet
@@ -4,6 +4,7 @@ import sys
 import ply.lex as lex
 import ply.yacc as yacc
 
+import dfa_lexer
 import lua_lexer_rules
 import lua_parser
 
@@ -13,6 +14,7 @@ def main():
     parser.add_argument('-s', '--source', type=str, help='source file')
     parser.add_argument('-d', '--destination', type=str, help='destination file for serialized AST')
     parser.add_argument('--pdb', action='store_true', help='debug AST w/ pdb')
+    parser.add_argument('--dfa-lexer', action='store_true', help='tokenize w/ the table-driven DFA lexer')
     args = parser.parse_args()
 
     if args.source is not None:
@@ -21,7 +23,7 @@ def main():
     else:
         data = sys.stdin.read()
 
-    lexer = lex.lex(module=lua_lexer_rules)
+    lexer = (dfa_lexer if args.dfa_lexer else lex).lex(module=lua_lexer_rules)
     parser = yacc.yacc(module=lua_parser)
     ast = parser.parse(data, lexer=lexer)
 
@@ -0,0 +1,110 @@
+import multiprocessing
+import os
+import resource
+import time
+import tracemalloc
+
+import ply.lex as lex
+import ply.yacc as yacc
+
+import dfa_lexer
+import lua_lexer_rules
+import lua_parser
+
+
+EXAMPLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'examples', 'example_large.lua')
+
+
+def measure(function, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def large_source(copies):
+    with open(EXAMPLE_PATH) as source:
+        return source.read() * copies
+
+
+def count_tokens(lexer, data):
+    lexer.input(data)
+    count = 0
+    while lexer.token() is not None:
+        count += 1
+    return count
+
+
+def benchmark_lexers(copies=20):
+    data = large_source(copies)
+    lexers = (('ply', lex.lex(module=lua_lexer_rules)), ('dfa', dfa_lexer.lex(module=lua_lexer_rules)))
+    print('lex example_large.lua x {} ({} KiB, {} tokens)'.format(copies, len(data) // 1024, count_tokens(lexers[0][1], data)))
+    for name, lexer in lexers:
+        elapsed = measure(count_tokens, lexer, data)
+        print('\t{}: {:.3f}s, {:.0f} tokens/s'.format(name, elapsed, count_tokens(lexer, data) / elapsed))
+
+
+def peak_memory(function, *args):
+    tracemalloc.start()
+    try:
+        result = function(*args)
+        return result, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_tokenize_all(copies=20):
+    data = large_source(copies)
+    lexer = dfa_lexer.lex(module=lua_lexer_rules)
+
+    def token_list():
+        lexer.input(data)
+        return list(iter(lexer.token, None))
+
+    tokens, list_memory = peak_memory(token_list)
+    token_array, array_memory = peak_memory(lexer.tokenize_all, data)
+    print('tokenize example_large.lua x {} ({} tokens)'.format(copies, len(tokens)))
+    print('\tlist of LexToken: {:.3f}s, peak {:.1f} MiB'.format(measure(token_list), list_memory / 1024 / 1024))
+    print('\ttokenize_all():   {:.3f}s, peak {:.1f} MiB'.format(measure(lexer.tokenize_all, data), array_memory / 1024 / 1024))
+
+
+# runs in a forked child so that ru_maxrss is the peak of this one run; the tokens are kept
+# while parsing, so the peak includes one object per token
+def parse_and_report(parser, lexer, data, connection):
+    start = time.perf_counter()
+    lexer.input(data)
+    tokens = list(iter(lexer.token, None))
+    tokens_count = len(tokens)
+    lex_time = time.perf_counter() - start
+    start = time.perf_counter()
+    parser.parse(data, lexer=lexer)
+    parse_time = time.perf_counter() - start
+    connection.send((tokens_count, lex_time, parse_time, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+
+def benchmark_parse(copies=200):
+    data = large_source(copies)
+    parser = yacc.yacc(module=lua_parser, debug=False, write_tables=False, errorlog=yacc.NullLogger())
+    context = multiprocessing.get_context('fork')
+    print('parse example_large.lua x {} ({} KiB)'.format(copies, len(data) // 1024))
+    for name, lexer in (('ply', lex.lex(module=lua_lexer_rules)), ('dfa', dfa_lexer.lex(module=lua_lexer_rules))):
+        receiver, sender = context.Pipe(duplex=False)
+        child = context.Process(target=parse_and_report, args=(parser, lexer, data, sender))
+        child.start()
+        tokens_count, lex_time, parse_time, peak_rss = receiver.recv()
+        child.join()
+        print('\t{}: {:.0f} tokens/s, parse {:.3f}s, peak RSS {:.1f} MiB'.format(
+            name, tokens_count / lex_time, parse_time, peak_rss / 1024))
+
+
+def main():
+    benchmark_lexers()
+    benchmark_tokenize_all()
+    benchmark_parse()
+
+
+if __name__ == '__main__':
+    main()
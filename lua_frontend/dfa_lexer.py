@@ -0,0 +1,433 @@
+from array import array
+from bisect import bisect_left
+import importlib.util
+import os
+import re
+import sys
+
+from ply.lex import LexError, LexToken
+
+
+# lab1 is loaded from its directory as the package lab1 instead of through sys.path, so that no
+# installed module can shadow it or its generically named modules (search, stream, engine, ...)
+def load_lab1():
+    directory = os.path.realpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'lab1'))
+    init_path = os.path.join(directory, '__init__.py')
+    package = sys.modules.get('lab1')
+    if package is not None and os.path.realpath(getattr(package, '__file__', None) or '') == init_path:
+        return package
+    spec = importlib.util.spec_from_file_location('lab1', init_path, submodule_search_locations=[directory])
+    package = importlib.util.module_from_spec(spec)
+    sys.modules['lab1'] = package
+    spec.loader.exec_module(package)
+    return package
+
+
+load_lab1()
+from lab1.dfa import DFA  # noqa: E402
+from lab1.symbol_classes import UNICODE_ALPHABET  # noqa: E402
+
+
+# python re escapes that stand for classes or control characters, in lab1 syntax
+ESCAPES = {
+    'd': '[0-9]',
+    'w': '[a-zA-Z0-9_]',
+    's': '[ \t\n\r\f\v]',
+    'n': '\n',
+    't': '\t',
+    'r': '\r',
+    'f': '\f',
+    'v': '\v',
+}
+CLASS_ESCAPES = {'d': '0-9', 'w': 'a-zA-Z0-9_', 's': ' \t\n\r\f\v', 'n': '\n', 't': '\t', 'r': '\r', 'f': '\f', 'v': '\v'}
+
+
+# translates the subset of python re syntax used by ply rules into lab1 syntax; any other escaped
+# letter or digit (\b, \A, \1, \x41, ...) is an error rather than that letter or digit
+def to_lab1_regexp(regexp):
+    result = []
+    class_start = None  # len(result) where the members of the current [...] start
+    chars = iter(regexp)
+    for char in chars:
+        if char == '\\':
+            escaped = next(chars, '\\')
+            escapes = ESCAPES if class_start is None else CLASS_ESCAPES
+            if escaped.isalnum() and escaped not in escapes:
+                raise ValueError('Unsupported escape \\{} in {!r}'.format(escaped, regexp))
+            result.append(escapes.get(escaped, '\\' + escaped))
+        elif class_start is not None:
+            if char == '^' and len(result) == class_start:
+                class_start += 1
+            elif char == ']' and len(result) > class_start:
+                class_start = None
+            result.append(char)
+        elif char == '[':
+            result.append(char)
+            class_start = len(result)
+        elif char == '.':
+            result.append('[^\n]')
+        elif char == '#':
+            result.append('\\#')
+        elif char in '^$':
+            raise ValueError('Anchors are not supported: {!r}'.format(regexp))
+        else:
+            result.append(char)
+    return ''.join(result)
+
+
+# (token type, function, regexp) in the order ply tries them: function rules by definition line,
+# then string rules by decreasing regexp length; t_ignore_* rules have no token type
+def get_rules(module):
+    function_rules = []
+    string_rules = []
+    for name in dir(module):
+        if not name.startswith('t_') or name in ('t_error', 't_eof', 't_ignore'):
+            continue
+        rule = getattr(module, name)
+        token_type = None if name.startswith('t_ignore_') else name[2:]
+        if callable(rule):
+            function_rules.append((token_type, rule, rule.__doc__))
+        else:
+            string_rules.append((token_type, None, rule))
+    function_rules.sort(key=lambda rule: rule[1].__code__.co_firstlineno)
+    string_rules.sort(key=lambda rule: len(rule[2]), reverse=True)
+    rules = function_rules + string_rules
+    if getattr(module, 'reserved_rule', None):
+        rules = fold_keywords(rules, module.reserved, module.reserved_rule)
+    return rules
+
+
+# ply's reserved words idiom, opted into by a module that names the rule in reserved_rule: that
+# function rule does nothing but look its match up in reserved (and reserved_values), so every
+# keyword gets a string rule ahead of it and it becomes a string rule itself; the DFA accept states
+# then tell keywords from identifiers
+def fold_keywords(rules, reserved, reserved_rule):
+    for index, (token_type, function, regexp) in enumerate(rules):
+        if token_type == reserved_rule and function is not None:
+            break
+    else:
+        raise ValueError('No function rule t_{} to fold reserved words into'.format(reserved_rule))
+    unmatched = [keyword for keyword in reserved if not re.fullmatch(regexp, keyword)]
+    if unmatched:
+        raise ValueError('Reserved words {} do not match t_{}'.format(unmatched, reserved_rule))
+    keyword_rules = [(reserved[keyword], None, re.escape(keyword)) for keyword in reserved]
+    return rules[:index] + keyword_rules + [(token_type, None, regexp)] + rules[index + 1:]
+
+
+# ply's t_newline idiom, opted into by a module that names the rule in newline_rule: that function
+# rule does nothing but count lines, which a lexer with a line index does from its newline offsets
+# instead, so (rules, ignore) with the newlines skipped as t_ignore characters
+def fold_newlines(rules, ignore, newline_rule):
+    newline_rules = [rule for rule in rules if rule[0] == newline_rule and rule[1] is not None]
+    if not newline_rules:
+        raise ValueError('No function rule t_{} to fold line counting into'.format(newline_rule))
+    rules = [rule for rule in rules if rule not in newline_rules]
+    if newline_rules[0][2] == r'\n+':
+        return rules, ignore + '\n'
+    return rules + [(None, None, newline_rules[0][2])], ignore
+
+
+# offsets of the newlines of data, the line index that line and column numbers are looked up in
+def newline_offsets(data):
+    offsets = array('I')
+    position = data.find('\n')
+    while position != -1:
+        offsets.append(position)
+        position = data.find('\n', position + 1)
+    return offsets
+
+
+class Lexer:
+    # stand-in for ply.lex.Lexer: all rules (and a run of t_ignore characters) form one multi-pattern
+    # DFA, token() takes the longest match and breaks ties by the order ply would try the rules in.
+    # For the Lua rules the longest match is the match ply picks, see lexer_test.py.
+    # constants maps the token types of string rules whose value is not the matched text to that value.
+    # With line_index the line numbers come from the newline offsets of the input (no rule counts
+    # lines), without it lineno is a counter the rules move on, as in ply
+    def __init__(self, rules, ignore='', errorf=None, constants=None, line_index=False):
+        self.rules = list(rules)
+        self.constants = constants or {}
+        self.line_index = line_index
+        if ignore:
+            self.rules.append((None, None, '[{}]+'.format(''.join('\\' + char for char in ignore))))
+        self.dfa = DFA.from_cache([to_lab1_regexp(regexp) for _, _, regexp in self.rules], UNICODE_ALPHABET)
+        table = self.dfa.table
+        self.symbol_classes = table.symbol_classes
+        if len(self.symbol_classes) > 256:
+            raise ValueError('Rules split the alphabet into more than 256 symbol classes')
+        # states are kept as row offsets (state * width), so a step is one lookup: rows[state + class_id]
+        width = table.width
+        self.rows = array('i', [destination * width for destination in table.table])
+        self.initial_row = table.initial_state * width
+        # the rule matched in every state: the first of the patterns it accepts
+        self.row_rules = [None] * len(self.rows)
+        for state, patterns in enumerate(table.accepts):
+            if patterns:
+                self.row_rules[state * width] = self.rules[min(patterns)]
+        self.errorf = errorf
+        # TokenArray type ids; types returned by rule functions (e.g. keywords) are added as they appear
+        self.type_names = list(dict.fromkeys(token_type for token_type, _, _ in self.rules if token_type is not None))
+        self.type_ids = {token_type: type_id for type_id, token_type in enumerate(self.type_names)}
+        self.lexdata = None
+        self.classes = None
+        self.lexpos = 0
+        self.lexlen = 0
+        # with line_index, line numbers are not counted while lexing: lineno of lexpos is first_lineno
+        # plus the number of newlines before lexpos in the index built by input(); columns always
+        # come from the index
+        self.newlines = array('I')
+        self.first_lineno = 1
+        # token() caches the line number of the line it is in and the offset of the newline that ends
+        # it; without line_index line_lineno is the counter itself and the cache never expires
+        self.line_lineno = 1
+        self.line_end = -1 if line_index else sys.maxsize
+
+    @property
+    def lineno(self):
+        if not self.line_index:
+            return self.line_lineno
+        return self.first_lineno + bisect_left(self.newlines, self.lexpos)
+
+    @lineno.setter
+    def lineno(self, lineno):
+        if not self.line_index:
+            self.line_lineno = lineno
+            return
+        self.first_lineno = lineno - bisect_left(self.newlines, self.lexpos)
+        self.line_end = -1
+
+    def _seek_line(self, lexpos):
+        line_index = bisect_left(self.newlines, lexpos)
+        self.line_lineno = self.first_lineno + line_index
+        self.line_end = self.newlines[line_index] if line_index < len(self.newlines) else self.lexlen
+
+    # without line_index only the line of the current position is known
+    def lineno_at(self, lexpos):
+        if not self.line_index:
+            return self.line_lineno
+        return self.first_lineno + bisect_left(self.newlines, lexpos)
+
+    # 1-based column of lexpos in its line
+    def column_at(self, lexpos):
+        line_index = bisect_left(self.newlines, lexpos)
+        return lexpos - (self.newlines[line_index - 1] if line_index else -1)
+
+    # the input is translated once into one byte (symbol class id) per character; lines go on from
+    # where the previous input stopped, as with ply
+    def input(self, data):
+        self.first_lineno = self.lineno
+        self.newlines = newline_offsets(data)
+        if self.line_index:
+            self.line_end = -1
+        self.lexdata = data
+        class_of = self.symbol_classes.class_of
+        self.classes = data.translate({ord(char): class_of(char) for char in set(data)}).encode('latin-1')
+        self.lexpos = 0
+        self.lexlen = len(data)
+
+    def skip(self, n):
+        self.lexpos += n
+
+    # (rule, end) of the longest match at lexpos, (None, lexpos) when nothing matches
+    def _longest_match(self, lexpos):
+        rows = self.rows
+        row_rules = self.row_rules
+        classes = self.classes
+        lexlen = self.lexlen
+        row = self.initial_row
+        rule = None
+        end = position = lexpos
+        while position < lexlen:
+            row = rows[row + classes[position]]
+            if not row:  # the dead state, row offset 0
+                break
+            position += 1
+            if row_rules[row] is not None:
+                rule = row_rules[row]
+                end = position
+        return rule, end
+
+    # t_error as ply calls it: it has to move lexpos on, its token (if any) is returned
+    def _error(self, lexpos):
+        lexdata = self.lexdata
+        if self.errorf is None:
+            self.lexpos = lexpos
+            raise LexError("Illegal character '{}' at index {}".format(lexdata[lexpos], lexpos), lexdata[lexpos:])
+        tok = LexToken()
+        tok.value = lexdata[lexpos:]
+        tok.lineno = self.lineno_at(lexpos)
+        tok.type = 'error'
+        tok.lexer = self
+        tok.lexpos = lexpos
+        self.lexpos = lexpos
+        newtok = self.errorf(tok)
+        if lexpos == self.lexpos:
+            raise LexError("Scanning error. Illegal character '{}'".format(lexdata[lexpos]), lexdata[lexpos:])
+        return newtok
+
+    # a function rule's token: the function sees the lexer positioned after the match
+    def _call_rule(self, function, token_type, lexpos, end):
+        tok = LexToken()
+        tok.value = self.lexdata[lexpos:end]
+        tok.lineno = self.lineno_at(lexpos)
+        tok.lexpos = lexpos
+        tok.type = token_type
+        tok.lexer = self
+        self.lexpos = end
+        return function(tok)
+
+    def token(self):
+        lexpos = self.lexpos
+        while lexpos < self.lexlen:
+            rule, end = self._longest_match(lexpos)
+            if rule is None:
+                newtok = self._error(lexpos)
+                lexpos = self.lexpos
+            else:
+                token_type, function, _ = rule
+                if function is None:
+                    if token_type is None:
+                        lexpos = end
+                        continue
+                    tok = LexToken()
+                    if token_type in self.constants:
+                        tok.value = self.constants[token_type]
+                    else:
+                        tok.value = self.lexdata[lexpos:end]
+                    if lexpos > self.line_end:
+                        self._seek_line(lexpos)
+                    tok.lineno = self.line_lineno
+                    tok.lexpos = lexpos
+                    tok.type = token_type
+                    self.lexpos = end
+                    return tok
+                newtok = self._call_rule(function, token_type, lexpos, end)
+                lexpos = self.lexpos
+            if newtok:
+                return newtok
+        self.lexpos = lexpos
+        return None
+
+    # all tokens of data at once, as a TokenArray; no LexToken is kept for string rule tokens
+    def tokenize_all(self, data):
+        self.input(data)
+        tokens = TokenArray(data, self.type_names, self.newlines, self.first_lineno, counted_lines=not self.line_index)
+        linenos = tokens.linenos
+        type_ids = self.type_ids
+        constants = self.constants
+        types = tokens.types
+        starts = tokens.starts
+        ends = tokens.ends
+        lexpos = 0
+        while lexpos < self.lexlen:
+            rule, end = self._longest_match(lexpos)
+            if rule is None:
+                newtok = self._error(lexpos)
+                end = lexpos = self.lexpos
+            else:
+                token_type, function, _ = rule
+                if function is None:
+                    if token_type is not None:
+                        types.append(type_ids[token_type])
+                        starts.append(lexpos)
+                        ends.append(end)
+                        if linenos is not None:
+                            linenos.append(self.line_lineno)
+                        if token_type in constants:
+                            tokens.values[len(types) - 1] = constants[token_type]
+                    lexpos = end
+                    continue
+                newtok = self._call_rule(function, token_type, lexpos, end)
+                lexpos = self.lexpos
+            if newtok:
+                if newtok.type not in type_ids:
+                    type_ids[newtok.type] = len(self.type_names)
+                    self.type_names.append(newtok.type)
+                types.append(type_ids[newtok.type])
+                starts.append(newtok.lexpos)
+                ends.append(end)
+                if linenos is not None:
+                    linenos.append(newtok.lineno)
+                if newtok.value != data[newtok.lexpos:end]:
+                    tokens.values[len(types) - 1] = newtok.value
+        self.lexpos = lexpos
+        return tokens
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        tok = self.token()
+        if tok is None:
+            raise StopIteration
+        return tok
+
+
+class TokenArray:
+    # tokens as parallel arrays: type ids (indices in type_names) and start and end offsets in lexdata,
+    # line and column numbers come from the lexer's newline index (line numbers are kept in linenos
+    # when the rules count lines); a value is the lexdata slice unless a rule function replaced it
+    # (values).
+    # token() hands out LexTokens one at a time, so yacc can parse from the array directly:
+    # parser.parse(lexer=tokens)
+    def __init__(self, lexdata, type_names, newlines, first_lineno=1, counted_lines=False):
+        self.lexdata = lexdata
+        self.type_names = type_names
+        self.newlines = newlines
+        self.first_lineno = first_lineno
+        self.linenos = array('I') if counted_lines else None
+        self.types = array('H')
+        self.starts = array('I')
+        self.ends = array('I')
+        self.values = {}
+        self.position = 0
+
+    def type(self, index):
+        return self.type_names[self.types[index]]
+
+    def value(self, index):
+        if index in self.values:
+            return self.values[index]
+        return self.lexdata[self.starts[index]:self.ends[index]]
+
+    def lineno(self, index):
+        if self.linenos is not None:
+            return self.linenos[index]
+        return self.first_lineno + bisect_left(self.newlines, self.starts[index])
+
+    def column(self, index):
+        start = self.starts[index]
+        line_index = bisect_left(self.newlines, start)
+        return start - (self.newlines[line_index - 1] if line_index else -1)
+
+    def __getitem__(self, index):
+        if not 0 <= index < len(self.types):
+            raise IndexError(index)
+        tok = LexToken()
+        tok.type = self.type(index)
+        tok.value = self.value(index)
+        tok.lineno = self.lineno(index)
+        tok.lexpos = self.starts[index]
+        return tok
+
+    def __len__(self):
+        return len(self.types)
+
+    def token(self):
+        if self.position >= len(self.types):
+            return None
+        self.position += 1
+        return self[self.position - 1]
+
+
+# counterpart of ply.lex.lex(module=...)
+def lex(module):
+    constants = {}
+    if getattr(module, 'reserved_rule', None):
+        constants = {module.reserved[keyword]: value for keyword, value in getattr(module, 'reserved_values', {}).items()}
+    rules = get_rules(module)
+    ignore = getattr(module, 't_ignore', '')
+    newline_rule = getattr(module, 'newline_rule', None)
+    if newline_rule:
+        rules, ignore = fold_newlines(rules, ignore, newline_rule)
+    return Lexer(rules, ignore, getattr(module, 't_error', None), constants, line_index=bool(newline_rule))
@@ -1,5 +1,9 @@
+import os
+import sys
+
 import ply.lex as lex
 
+import dfa_lexer
 import lua_lexer_rules
 
 
@@ -106,19 +110,146 @@ def test_keywords(lexer):
     test_case(lexer, data, expected)
 
 
+def test_folded_keywords(lexer):
+    assert all(function is None for token_type, function, _ in lexer.rules if token_type in ('NAME', 'NIL', 'END'))
+    data = '''
+        nil nil_ ends end1 _end doend do
+    '''
+    expected = [('NIL', None), ('NAME', 'nil_'), ('NAME', 'ends'), ('NAME', 'end1'), ('NAME', '_end'), ('NAME', 'doend'),
+                ('DO', 'do')]
+    test_case(lexer, data, expected)
+
+
+def test_line_numbers(lexer):
+    assert all(token_type != 'newline' for token_type, _, _ in lexer.rules)
+    data = 'local a\n\n  b = 1\n\tc'
+    lexer.lineno = 1
+    lexer.input(data)
+    expected = [(1, 1), (1, 7), (3, 3), (3, 5), (3, 7), (4, 2)]
+    assert [(tok.lineno, lexer.column_at(tok.lexpos)) for tok in lexer] == expected
+    assert lexer.lineno == 4
+    lexer.lineno = 1
+    tokens = lexer.tokenize_all(data)
+    assert [(tokens.lineno(i), tokens.column(i)) for i in range(len(tokens))] == expected
+    lexer.input('x')
+    assert lexer.token().lineno == 4
+
+
+class RulesWithoutReservedRule:
+    reserved = {'end': 'END'}
+    tokens = ['NAME', 'END']
+    t_ignore = ' '
+
+    @staticmethod
+    def t_NAME(t):
+        r'[a-z]+'
+        t.type = RulesWithoutReservedRule.reserved.get(t.value, 'NAME')
+        t.value = t.value.upper()
+        return t
+
+
+def test_reserved_rule_opt_in():
+    lexer = dfa_lexer.lex(module=RulesWithoutReservedRule)
+    assert [rule[0] for rule in lexer.rules if rule[1] is not None] == ['NAME']
+    test_case(lexer, 'end ends', [('END', 'END'), ('NAME', 'ENDS')])
+
+
+class RulesWithNewlineTokens:
+    tokens = ['WORD', 'NEWLINE']
+    t_ignore_SPACES = r'\ +'
+    t_WORD = r'[a-z]+'
+
+    @staticmethod
+    def t_newline(t):
+        r'\n+'
+        t.lexer.lineno += len(t.value)
+        t.type = 'NEWLINE'
+        return t
+
+    @staticmethod
+    def t_error(t):
+        t.lexer.skip(1)
+
+
+def test_newline_rule_opt_in():
+    data = 'a\nb\n\n c d\ne'
+    ply_lexer = lex.lex(module=RulesWithNewlineTokens)
+    lexer = dfa_lexer.lex(module=RulesWithNewlineTokens)
+    assert not lexer.line_index
+    for lineno in (1, 5):
+        ply_lexer.lineno = lexer.lineno = lineno
+        ply_lexer.input(data)
+        lexer.input(data)
+        expected = [(tok.type, tok.value, tok.lineno, tok.lexpos) for tok in ply_lexer]
+        assert [tok[0] for tok in expected].count('NEWLINE') == 3
+        assert [(tok.type, tok.value, tok.lineno, tok.lexpos) for tok in lexer] == expected
+        assert lexer.lineno == ply_lexer.lineno
+        lexer.lineno = lineno
+        tokens = lexer.tokenize_all(data)
+        assert [(tokens.type(i), tokens.value(i), tokens.lineno(i), tokens.starts[i]) for i in range(len(tokens))] == expected
+
+
+def test_unsupported_escapes():
+    assert dfa_lexer.to_lab1_regexp(r'\-\-[\d\.]') == r'\-\-[0-9\.]'
+    for regexp in (r'\bend', r'[\b]', r'\Aa', r'(a)\1', r'\x41'):
+        try:
+            dfa_lexer.to_lab1_regexp(regexp)
+        except ValueError:
+            continue
+        assert False, '{!r} did not raise ValueError'.format(regexp)
+
+
+def test_lab1_package():
+    assert dfa_lexer.DFA.__module__ == 'lab1.dfa'
+    lab1_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'lab1')
+    assert os.path.samefile(os.path.dirname(sys.modules['lab1.search'].__file__), lab1_directory)
+
+
+def test_same_as_ply(ply_lexer, lexer):
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'examples', 'example_large.lua')) as source:
+        data = source.read()
+    ply_lexer.input(data)
+    lexer.input(data)
+    ply_tokens = [(tok.type, tok.value, tok.lineno, tok.lexpos) for tok in ply_lexer]
+    tokens = [(tok.type, tok.value, tok.lineno, tok.lexpos) for tok in lexer]
+    assert ply_tokens == tokens, 'First difference: {}'.format(
+        next((ply_token, token) for ply_token, token in zip(ply_tokens, tokens) if ply_token != token))
+
+
+def test_tokenize_all(lexer):
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'examples', 'example_large.lua')) as source:
+        data = source.read()
+    lexer.lineno = 1
+    lexer.input(data)
+    expected = [(tok.type, tok.value, tok.lineno, tok.lexpos) for tok in lexer]
+    lexer.lineno = 1
+    tokens = lexer.tokenize_all(data)
+    assert len(tokens) == len(expected)
+    assert [(tokens.type(i), tokens.value(i), tokens.lineno(i), tokens.starts[i]) for i in range(len(tokens))] == expected
+    assert [(tok.type, tok.value, tok.lineno, tok.lexpos) for tok in iter(tokens.token, None)] == expected
+    assert tokens.values and all(not isinstance(value, str) for value in tokens.values.values())
+
+
 def test():
-    lexer = lex.lex(module=lua_lexer_rules)
-
-    test_name(lexer)
-    test_equals_and_assigment(lexer)
-    test_literal_string(lexer)
-    test_number(lexer)
-    test_tokens_in_string(lexer)
-    test_nil_true_false(lexer)
-    test_dot_concat_vararg(lexer)
-    test_bitwise_ops(lexer)
-    test_not_equals_bitwise_not(lexer)
-    test_keywords(lexer)
+    for lexer in (lex.lex(module=lua_lexer_rules), dfa_lexer.lex(module=lua_lexer_rules)):
+        test_name(lexer)
+        test_equals_and_assigment(lexer)
+        test_literal_string(lexer)
+        test_number(lexer)
+        test_tokens_in_string(lexer)
+        test_nil_true_false(lexer)
+        test_dot_concat_vararg(lexer)
+        test_bitwise_ops(lexer)
+        test_not_equals_bitwise_not(lexer)
+        test_keywords(lexer)
+    test_folded_keywords(dfa_lexer.lex(module=lua_lexer_rules))
+    test_reserved_rule_opt_in()
+    test_newline_rule_opt_in()
+    test_unsupported_escapes()
+    test_lab1_package()
+    test_line_numbers(dfa_lexer.lex(module=lua_lexer_rules))
+    test_same_as_ply(lex.lex(module=lua_lexer_rules), dfa_lexer.lex(module=lua_lexer_rules))
+    test_tokenize_all(dfa_lexer.lex(module=lua_lexer_rules))
 
 
 if __name__ == '__main__':
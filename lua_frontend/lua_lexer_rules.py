@@ -23,6 +23,13 @@ reserved = {
     'while': 'WHILE',
 }
 
+# keywords whose token value is a constant instead of the matched text
+reserved_values = {
+    'nil': None,
+    'true': True,
+    'false': False,
+}
+
 tokens = [
     'NAME',
     'NUMBER',
@@ -63,15 +70,15 @@ tokens = [
 ] + list(reserved.values())
 
 
+# t_NAME only looks names up in reserved and reserved_values, so dfa_lexer may fold the
+# keywords into its tables instead of calling it
+reserved_rule = 'NAME'
+
+
 def t_NAME(t):
     r'[a-zA-Z_][a-zA-Z_0-9]*'
     t.type = reserved.get(t.value, 'NAME')
-    if t.type == 'NIL':
-        t.value = None
-    elif t.type == 'TRUE':
-        t.value = True
-    elif t.type == 'FALSE':
-        t.value = False
+    t.value = reserved_values.get(t.value, t.value)
     return t
 
 
@@ -122,6 +129,10 @@ t_CONCAT = r'\.\.'
 t_DOT = r'\.'
 
 
+# t_newline only counts lines, so dfa_lexer may take line numbers from a newline index instead
+newline_rule = 'newline'
+
+
 def t_newline(t):
     r'\n+'
     t.lexer.lineno += len(t.value)
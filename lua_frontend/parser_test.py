@@ -1,8 +1,10 @@
 import json
+import os
 
 import ply.lex as lex
 import ply.yacc as yacc
 
+import dfa_lexer
 import lua_lexer_rules
 import lua_parser
 
@@ -368,15 +370,23 @@ def test_loop(parser, lexer):
     test_case(parser, lexer, data, expected_statements)
 
 
+def test_parse_token_array(parser):
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'examples', 'example_large.lua')) as source:
+        data = source.read()
+    expected_ast = str(parser.parse(data, lexer=lex.lex(module=lua_lexer_rules)))
+    tokens = dfa_lexer.lex(module=lua_lexer_rules).tokenize_all(data)
+    assert str(parser.parse(lexer=tokens)) == expected_ast
+
+
 def test():
-    lexer = lex.lex(module=lua_lexer_rules)
     parser = yacc.yacc(module=lua_parser)
-
-    test_assignment(parser, lexer)
-    test_binary_operation_priority(parser, lexer)
-    test_binary_operation_priority_override(parser, lexer)
-    test_table(parser, lexer)
-    test_loop(parser, lexer)
+    for lexer in (lex.lex(module=lua_lexer_rules), dfa_lexer.lex(module=lua_lexer_rules)):
+        test_assignment(parser, lexer)
+        test_binary_operation_priority(parser, lexer)
+        test_binary_operation_priority_override(parser, lexer)
+        test_table(parser, lexer)
+        test_loop(parser, lexer)
+    test_parse_token_array(parser)
 
 
 if __name__ == '__main__':
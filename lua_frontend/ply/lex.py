@@ -61,7 +61,12 @@ class LexError(Exception):
 
 
 # Token class.  This class is used to represent the tokens produced.
+# Slots keep tokens dict-free; optional attributes (lexer, endlineno,
+# endlexpos) stay unset until assigned, so hasattr()/getattr() defaults
+# work as before.
 class LexToken(object):
+    __slots__ = ('type', 'value', 'lineno', 'lexpos', 'lexer', 'endlineno', 'endlexpos')
+
     def __str__(self):
         return 'LexToken(%s,%r,%d,%d)' % (self.type, self.value, self.lineno, self.lexpos)
 
@@ -212,8 +212,12 @@ def call_errorfunc(errorfunc, token, parser):
 #        .endlineno  = Ending line number (optional, set automatically)
 #        .lexpos     = Starting lex position
 #        .endlexpos  = Ending lex position (optional, set automatically)
+#
+# Optional attributes are unset slots until assigned, as with LexToken.
 
 class YaccSymbol:
+    __slots__ = ('type', 'value', 'lineno', 'lexpos', 'endlineno', 'endlexpos', 'lexer')
+
     def __str__(self):
         return self.type
 